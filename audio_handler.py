@@ -1,24 +1,322 @@
-import pyaudio
+try:
+    # PyAudioWPatch is a drop-in PyAudio fork that exposes WASAPI loopback devices on Windows
+    import pyaudiowpatch as pyaudio
+except ImportError:
+    import pyaudio
 import speech_recognition as sr
+import os
+import sys
 import threading
 import time
 import asyncio
+import logging
+import queue
 import numpy as np
-from typing import Callable, Optional
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Callable, List, Optional
 from config import Config
-import concurrent.futures
+from speech_client import GoogleSpeechSession
+
+# Never print() from the capture threads: stdout writes can block them. Records are
+# handed to the QueueHandler installed by logging_config.setup_logging().
+log = logging.getLogger(__name__)
+
+
+def _aligned_empty(size: int, dtype, alignment: int = 64) -> np.ndarray:
+    """Allocate an uninitialized array whose data starts on an `alignment`-byte boundary"""
+    dtype = np.dtype(dtype)
+    raw = np.empty(size * dtype.itemsize + alignment, dtype=np.uint8)
+    offset = -raw.ctypes.data % alignment
+    return raw[offset:offset + size * dtype.itemsize].view(dtype)
+
+
+def _trailing_silent_frames(samples: np.ndarray, threshold: float, frame_size: int, abs_buf: np.ndarray,
+                            level_buf: np.ndarray, silent_buf: np.ndarray) -> int:
+    """Count the silent VAD frames at the end of a chunk of int16 samples
+
+    Scratch buffers are preallocated by the caller so no arrays are created per chunk.
+    """
+    n_frames = samples.shape[0] // frame_size
+    if n_frames == 0:
+        return 0
+    out = abs_buf[:n_frames * frame_size]
+    # Compute in int32: abs(-32768) overflows int16, and out= alone still computes in int16
+    np.abs(samples[:out.shape[0]], out=out, dtype=np.int32)
+    levels = level_buf[:n_frames]
+    out.reshape(n_frames, frame_size).mean(axis=1, out=levels)
+    silent = silent_buf[:n_frames]
+    np.less(levels, threshold, out=silent)
+    if silent.all():
+        return n_frames
+    # Position of the last voiced frame, counted from the end
+    return int(np.argmin(silent[::-1]))
+
+
+# Process-wide PortAudio context shared by every SystemAudioSource
+_pa_lock = threading.Lock()
+_pa = None
+_pa_refs = 0
+
+
+def acquire_pa() -> "pyaudio.PyAudio":
+    """Return the shared PyAudio instance, initializing PortAudio on first use"""
+    global _pa, _pa_refs
+    with _pa_lock:
+        if _pa is None:
+            _pa = pyaudio.PyAudio()
+        _pa_refs += 1
+        return _pa
+
+
+def release_pa():
+    """Drop a reference to the shared PyAudio instance, terminating it with the last one"""
+    global _pa, _pa_refs
+    with _pa_lock:
+        if _pa_refs == 0:
+            return
+        _pa_refs -= 1
+        if _pa_refs == 0:
+            _pa.terminate()
+            _pa = None
+
+
+def _boost_current_thread():
+    """Pin the calling thread to Config.AUDIO_THREAD_CPU and raise its scheduling priority (best effort)"""
+    cpu = Config.AUDIO_THREAD_CPU
+    try:
+        if sys.platform.startswith('linux'):
+            # On Linux these calls accept a thread id and only affect the calling thread
+            tid = threading.get_native_id()
+            if cpu is not None:
+                os.sched_setaffinity(tid, {cpu})
+            if Config.AUDIO_THREAD_REALTIME:
+                os.sched_setscheduler(tid, os.SCHED_FIFO, os.sched_param(os.sched_get_priority_min(os.SCHED_FIFO)))
+            else:
+                os.setpriority(os.PRIO_PROCESS, tid, -10)
+        elif sys.platform == 'win32':
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            thread = kernel32.GetCurrentThread()
+            if cpu is not None:
+                kernel32.SetThreadAffinityMask(thread, 1 << cpu)
+            if Config.AUDIO_THREAD_REALTIME:
+                kernel32.SetThreadPriority(thread, 15)  # THREAD_PRIORITY_TIME_CRITICAL
+            else:
+                kernel32.SetThreadPriority(thread, 2)  # THREAD_PRIORITY_HIGHEST
+    except (OSError, AttributeError) as e:
+        log.warning("Could not raise audio thread priority: %s", e)
+
+
+def _lowpass_taps(decimation: int, taps_per_phase: int = 16) -> np.ndarray:
+    """Windowed-sinc anti-aliasing filter for decimating by `decimation`"""
+    n_taps = taps_per_phase * decimation + 1
+    cutoff = 0.45 / decimation  # Just under the new Nyquist, relative to the capture rate
+    n = np.arange(n_taps) - (n_taps - 1) / 2
+    taps = np.sinc(2 * cutoff * n) * np.hamming(n_taps)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+class _CaptureConverter:
+    """Downmix interleaved int16 capture to mono and decimate it to Config.AUDIO_RATE"""
+
+    def __init__(self, channels: int, decimation: int, frames_per_buffer: int):
+        self.channels = channels
+        self.decimation = decimation
+        # Reversed so a dot product with each input window is the convolution
+        self._taps = _lowpass_taps(decimation)[::-1].copy() if decimation > 1 else None
+        self._history = 0 if self._taps is None else self._taps.shape[0] - 1
+        self._phase = 0  # Offset of the next output sample into the following chunk
+        self._allocate(frames_per_buffer)
+
+    def _allocate(self, frames: int):
+        """(Re)size the scratch buffers; only happens if PortAudio delivers a larger chunk"""
+        self._frames = frames
+        mixed = np.zeros(self._history + frames, dtype=np.float32)
+        if hasattr(self, '_mixed'):
+            # Keep the filter history across a resize
+            mixed[:self._history] = self._mixed[:self._history]
+        self._mixed = mixed
+        out_len = frames // self.decimation + 1
+        self._out = np.empty(out_len, dtype=np.float32)
+        self._pcm = np.empty(out_len, dtype=np.int16)
+
+    def process(self, in_data) -> bytes:
+        """Convert one capture chunk into mono int16 PCM at the output rate"""
+        frames = np.frombuffer(in_data, dtype=np.int16).reshape(-1, self.channels)
+        n = frames.shape[0]
+        if n > self._frames:
+            self._allocate(n)
+
+        history = self._history
+        mixed = self._mixed[history:history + n]
+        # Average the channels rather than summing them so loud stereo can't clip
+        np.mean(frames, axis=1, dtype=np.float32, out=mixed)
+
+        if self._taps is None:
+            out = mixed
+        else:
+            # One windowed dot product per kept output sample: filtering and decimation fused
+            windows = sliding_window_view(self._mixed[:history + n], self._taps.shape[0])[self._phase::self.decimation]
+            out = self._out[:windows.shape[0]]
+            np.dot(windows, self._taps, out=out)
+            self._phase = (self._phase - n) % self.decimation
+            # Carry the tail over as the next chunk's filter history
+            self._mixed[:history] = self._mixed[n:n + history]
+
+        np.clip(out, -32768, 32767, out=out)
+        pcm = self._pcm[:out.shape[0]]
+        np.rint(out, out=out)
+        pcm[:] = out
+        return pcm.tobytes()
+
+
+class SystemAudioSource:
+    """Single system audio capture stream fanned out to any number of subscribers"""
+
+    # Common system audio device names
+    SYSTEM_AUDIO_KEYWORDS = (
+        'stereo mix', 'what u hear', 'loopback', 'wave out mix',
+        'speakers', 'headphones', 'primary sound capture driver'
+    )
+
+    def __init__(self):
+        self.audio = acquire_pa()
+        self.stream = None
+        self.system_audio_device = None
+        # Replaced (never mutated) on change so the PortAudio thread iterates a stable list
+        self.subscribers: List[Callable[[bytes], None]] = []
+        self._lock = threading.Lock()
+        self._callback_thread_boosted = False
+
+        if Config.AUDIO_CAPTURE_RATE % Config.AUDIO_RATE:
+            raise ValueError(f"AUDIO_CAPTURE_RATE must be a multiple of {Config.AUDIO_RATE}, got {Config.AUDIO_CAPTURE_RATE}")
+        self._decimation = Config.AUDIO_CAPTURE_RATE // Config.AUDIO_RATE
+        # Subscribers always see AUDIO_CHUNK_SIZE mono samples per chunk
+        self._frames_per_buffer = Config.AUDIO_CHUNK_SIZE * self._decimation
+        self._converter = None
+        if Config.AUDIO_CAPTURE_CHANNELS != 1 or self._decimation != 1:
+            self._converter = _CaptureConverter(Config.AUDIO_CAPTURE_CHANNELS, self._decimation, self._frames_per_buffer)
+
+        # Find system audio output device
+        self._find_system_audio_device()
+
+    def _find_system_audio_device(self):
+        """Find the system audio output device (loopback/stereo mix)"""
+        log.info("Searching for system audio devices...")
+
+        # Query PortAudio once and filter in Python
+        devices = [self.audio.get_device_info_by_index(i) for i in range(self.audio.get_device_count())]
+        input_devices = [d for d in devices if d['maxInputChannels'] > 0]
+        candidates = [
+            d for d in input_devices
+            if any(keyword in d['name'].lower() for keyword in self.SYSTEM_AUDIO_KEYWORDS)
+        ]
+
+        # Prefer WASAPI loopback endpoints, the lowest-latency loopback path on Windows
+        try:
+            wasapi_index = self.audio.get_host_api_info_by_type(pyaudio.paWASAPI)['index']
+        except (OSError, AttributeError):
+            wasapi_index = None
+        candidates.sort(key=lambda d: (not d.get('isLoopbackDevice', False), d['hostApi'] != wasapi_index))
+
+        for device_info in candidates:
+            if self._supports_capture_format(device_info['index']):
+                self.system_audio_device = device_info['index']
+                log.info(f"Found system audio device: {device_info['name']} (Index: {device_info['index']})")
+                break
+
+        if self.system_audio_device is None:
+            log.warning("⚠️ No system audio device found. Available devices:")
+            for device_info in input_devices:
+                log.info(f"  {device_info['index']}: {device_info['name']} (Inputs: {device_info['maxInputChannels']})")
+
+            # Fallback to default input device
+            try:
+                self.system_audio_device = self.audio.get_default_input_device_info()['index']
+                log.info(f"Using default input device as fallback: {self.system_audio_device}")
+            except:
+                log.error("❌ No audio input devices available")
+                raise Exception("No audio input devices available")
+
+    def _supports_capture_format(self, device_index: int) -> bool:
+        """Check that the device can be opened with the capture format used by the stream"""
+        try:
+            return self.audio.is_format_supported(
+                Config.AUDIO_CAPTURE_RATE,
+                input_device=device_index,
+                input_channels=Config.AUDIO_CAPTURE_CHANNELS,
+                input_format=pyaudio.paInt16
+            )
+        except ValueError:
+            return False
+
+    def subscribe(self, callback: Callable[[bytes], None]):
+        """Register a chunk consumer; the stream is opened for the first subscriber"""
+        with self._lock:
+            if callback not in self.subscribers:
+                self.subscribers = self.subscribers + [callback]
+            if self.stream is None:
+                self.stream = self.audio.open(
+                    format=pyaudio.paInt16,
+                    channels=Config.AUDIO_CAPTURE_CHANNELS,
+                    rate=Config.AUDIO_CAPTURE_RATE,
+                    input=True,
+                    input_device_index=self.system_audio_device,
+                    frames_per_buffer=self._frames_per_buffer,
+                    stream_callback=self._audio_callback
+                )
+                self._callback_thread_boosted = False
+                self.stream.start_stream()
+                log.info(f"Opened system audio stream on device {self.system_audio_device}")
+
+    def unsubscribe(self, callback: Callable[[bytes], None]):
+        """Remove a chunk consumer; the stream is closed with the last subscriber"""
+        with self._lock:
+            self.subscribers = [cb for cb in self.subscribers if cb != callback]
+            if not self.subscribers and self.stream is not None:
+                self.stream.stop_stream()
+                self.stream.close()
+                self.stream = None
+                log.info("Closed system audio stream")
+
+    def _audio_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio callback: hand the chunk to every subscriber"""
+        if not self._callback_thread_boosted:
+            # PortAudio owns this thread; tune it from inside on first use
+            self._callback_thread_boosted = True
+            _boost_current_thread()
+        if self._converter is not None:
+            in_data = self._converter.process(in_data)
+        for callback in self.subscribers:
+            try:
+                callback(in_data)
+            except Exception as e:
+                log.error("Error in audio subscriber: %s", e)
+        return (None, pyaudio.paContinue)
+
+    def __del__(self):
+        """Cleanup audio resources"""
+        if getattr(self, 'stream', None) is not None:
+            self.stream.close()
+        if hasattr(self, 'audio'):
+            release_pa()
 
 
 class AudioHandler:
-    def __init__(self, on_transcription: Callable[[str], None]):
-        self.recognizer = sr.Recognizer()
+    def __init__(self, on_transcription: Callable[[str], None], source: Optional[SystemAudioSource] = None):
+        # Keep-alive session to Google Speech, reused for every segment
+        self.speech = GoogleSpeechSession()
         self.on_transcription = on_transcription
         self.is_listening = False
         self.audio_thread = None
-        self.audio = pyaudio.PyAudio()
-        self.system_audio_device = None
-        self.loop = None
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+        # Decide once how transcriptions are dispatched. When constructed inside the
+        # server's event loop, coroutine callbacks are scheduled onto that loop.
+        self._callback_is_coroutine = asyncio.iscoroutinefunction(on_transcription)
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop = None
         
         # Language configuration
         self.language = Config.DEFAULT_LANGUAGE
@@ -27,21 +325,51 @@ class AudioHandler:
         self.silence_threshold = Config.SILENCE_THRESHOLD
         self.silence_duration = Config.SILENCE_DURATION
         self.processing_lag_ms = 500  # Default processing lag
-        
-        print(f"AudioHandler initialized with language: {self.language}")
-        print(f"Real-time config - Silence threshold: {self.silence_threshold}, Duration: {self.silence_duration}s")
 
-        # Find system audio output device
-        self._find_system_audio_device()
+        # Read per chunk, so cached on the instance rather than looked up on Config each time
+        chunk = Config.AUDIO_CHUNK_SIZE
+        self._vad_frame_size = Config.VAD_FRAME_SIZE
+        if chunk & (chunk - 1) or chunk % self._vad_frame_size:
+            raise ValueError(f"AUDIO_CHUNK_SIZE must be a power of two and a multiple of VAD_FRAME_SIZE, got {chunk}")
+
+        # Scratch buffers reused by the silence detector on every chunk (cache-line aligned for SIMD)
+        frames_per_chunk = chunk // self._vad_frame_size
+        self._abs_buf = _aligned_empty(chunk, np.int32)
+        self._level_buf = np.empty(frames_per_chunk, dtype=np.float64)
+        self._silent_buf = np.empty(frames_per_chunk, dtype=bool)
+
+        # Preallocated segment buffers (16-bit mono PCM). A filled buffer is handed to the
+        # uploader as-is and returned to the pool afterwards, so segments are never copied.
+        chunk_bytes = Config.AUDIO_CHUNK_SIZE * 2
+        max_chunks = max(2, int(Config.MAX_SEGMENT_DURATION * Config.AUDIO_RATE) // Config.AUDIO_CHUNK_SIZE)
+        self._segment_bytes = max_chunks * chunk_bytes
+        self._free_buffers = queue.SimpleQueue()
+        for _ in range(4):  # one capturing, one transcribing, two queued
+            self._free_buffers.put(bytearray(self._segment_bytes))
+
+        # Hand-off from the PortAudio callback thread to the segmenting thread
+        self._chunks = queue.SimpleQueue()
+
+        # Shared capture stream (device discovery happens once, in the source). Opened
+        # before the worker starts, so a failing device leaves no thread behind.
+        self.source = source or SystemAudioSource()
+
+        # Single long-lived transcription worker; at most two segments wait behind it
+        self._jobs = queue.Queue(maxsize=2)
+        self._worker = threading.Thread(target=self._transcription_loop, daemon=True)
+        self._worker.start()
+        
+        log.info(f"AudioHandler initialized with language: {self.language}")
+        log.info(f"Real-time config - Silence threshold: {self.silence_threshold}, Duration: {self.silence_duration}s")
 
     def set_language(self, lang_code: str) -> bool:
         """Set the language for speech recognition"""
         if lang_code in Config.SUPPORTED_LANGUAGES:
             self.language = lang_code
-            print(f"Language set to: {self.language} ({Config.SUPPORTED_LANGUAGES[lang_code]})")
+            log.info(f"Language set to: {self.language} ({Config.SUPPORTED_LANGUAGES[lang_code]})")
             return True
         else:
-            print(f"Warning: Attempted to set unsupported language: {lang_code}")
+            log.warning(f"Warning: Attempted to set unsupported language: {lang_code}")
             return False
     
     def update_realtime_config(self, model_config: dict):
@@ -53,7 +381,7 @@ class AudioHandler:
         # Update silence detection if significantly different
         if abs(new_silence_duration - self.silence_duration) > 0.2:  # Only update if 200ms+ difference
             self.silence_duration = new_silence_duration
-            print(f"Real-time processing updated - Processing lag: {self.processing_lag_ms}ms, Silence duration: {self.silence_duration}s")
+            log.info(f"Real-time processing updated - Processing lag: {self.processing_lag_ms}ms, Silence duration: {self.silence_duration}s")
         
         # Adjust silence threshold for more responsive detection in meetings/interviews
         # Faster models can use lower thresholds for quicker response
@@ -64,42 +392,6 @@ class AudioHandler:
         else:  # Slower models
             self.silence_threshold = Config.SILENCE_THRESHOLD  # Keep default
 
-    def _find_system_audio_device(self):
-        """Find the system audio output device (loopback/stereo mix)"""
-        print("Searching for system audio devices...")
-
-        for i in range(self.audio.get_device_count()):
-            device_info = self.audio.get_device_info_by_index(i)
-            device_name = device_info['name'].lower()
-
-            # Look for common system audio device names
-            system_audio_keywords = [
-                'stereo mix', 'what u hear', 'loopback', 'wave out mix',
-                'speakers', 'headphones', 'primary sound capture driver'
-            ]
-
-            # Check if this device can be used for input and matches system audio patterns
-            if (device_info['maxInputChannels'] > 0 and
-                    any(keyword in device_name for keyword in system_audio_keywords)):
-                self.system_audio_device = i
-                print(f"Found system audio device: {device_info['name']} (Index: {i})")
-                break
-
-        if self.system_audio_device is None:
-            print("⚠️ No system audio device found. Available devices:")
-            for i in range(self.audio.get_device_count()):
-                device_info = self.audio.get_device_info_by_index(i)
-                if device_info['maxInputChannels'] > 0:
-                    print(f"  {i}: {device_info['name']} (Inputs: {device_info['maxInputChannels']})")
-
-            # Fallback to default input device
-            try:
-                self.system_audio_device = self.audio.get_default_input_device_info()['index']
-                print(f"Using default input device as fallback: {self.system_audio_device}")
-            except:
-                print("❌ No audio input devices available")
-                raise Exception("No audio input devices available")
-
     def start_listening(self):
         """Start continuous audio listening in a separate thread"""
         if not self.is_listening:
@@ -107,93 +399,147 @@ class AudioHandler:
             self.audio_thread = threading.Thread(target=self._listen_continuously)
             self.audio_thread.daemon = True
             self.audio_thread.start()
-            print("Started listening to system audio...")
+            log.info("Started listening to system audio...")
 
     def stop_listening(self):
         """Stop audio listening"""
         self.is_listening = False
         if self.audio_thread:
             self.audio_thread.join(timeout=1)
-        print("Stopped listening.")
+        log.info("Stopped listening.")
+
+    def close(self):
+        """Stop listening and shut down the transcription worker"""
+        self.stop_listening()
+        # Discard pending segments; the sentinel stops the worker after its current one
+        while True:
+            try:
+                buffer, _ = self._jobs.get_nowait()
+                self._free_buffers.put(buffer)
+            except queue.Empty:
+                break
+        self._jobs.put(None)
+        self._worker.join(timeout=1)
+        self.speech.close()
+
+    def _on_audio(self, in_data: bytes):
+        """Audio source subscriber: measure trailing silence and hand the chunk off without blocking"""
+        samples = np.frombuffer(in_data, dtype=np.int16)
+        frame_size = self._vad_frame_size
+        trailing_silence = _trailing_silent_frames(
+            samples, self.silence_threshold, frame_size, self._abs_buf, self._level_buf, self._silent_buf
+        )
+        self._chunks.put((in_data, trailing_silence, samples.shape[0] // frame_size))
 
     def _listen_continuously(self):
         """Continuously listen for system audio and transcribe"""
-        stream = None
+        subscribed = False
+        ring = None
+        _boost_current_thread()
         try:
-            # Open audio stream for system audio capture
-            stream = self.audio.open(
-                format=pyaudio.paInt16,
-                channels=1,
-                rate=Config.AUDIO_RATE,
-                input=True,
-                input_device_index=self.system_audio_device,
-                frames_per_buffer=Config.AUDIO_CHUNK_SIZE
-            )
+            # Drop chunks left over from a previous session
+            self._chunks = queue.SimpleQueue()
 
-            print(f"Listening to system audio on device {self.system_audio_device}...")
+            # The shared source delivers chunks to _on_audio from the PortAudio thread
+            self.source.subscribe(self._on_audio)
+            subscribed = True
 
-            audio_buffer = []
+            log.info(f"Listening to system audio on device {self.source.system_audio_device}...")
+
+            ring = self._take_buffer()
+            ring_size = len(ring)
+            write = 0
+            min_segment_bytes = int(Config.MIN_SEGMENT_DURATION * Config.AUDIO_RATE) * 2
             silence_counter = 0
-            # Use dynamic silence duration instead of static config
-            silence_threshold = int(self.silence_duration * Config.AUDIO_RATE / Config.AUDIO_CHUNK_SIZE)
+            # Use dynamic silence duration instead of static config, counted in VAD frames
+            silence_threshold = int(self.silence_duration * Config.AUDIO_RATE / Config.VAD_FRAME_SIZE)
 
             while self.is_listening:
                 try:
-                    # Read audio data
-                    data = stream.read(Config.AUDIO_CHUNK_SIZE, exception_on_overflow=False)
-                    audio_buffer.append(data)
-
-                    # Convert to numpy array for analysis
-                    audio_array = np.frombuffer(data, dtype=np.int16)
-                    audio_level = np.abs(audio_array).mean()
-
-                    # Check for silence using dynamic threshold
-                    if audio_level < self.silence_threshold:
-                        silence_counter += 1
+                    # Wait for the next chunk from the callback thread
+                    try:
+                        data, trailing_silence, n_frames = self._chunks.get(timeout=0.5)
+                    except queue.Empty:
+                        continue
+
+                    # Prevent the segment from outgrowing the buffer: keep the most recent half
+                    if write + len(data) > ring_size:
+                        keep = ring_size // 2
+                        ring[:keep] = ring[write - keep:write]
+                        write = keep
+
+                    ring[write:write + len(data)] = data
+                    write += len(data)
+
+                    # Extend the silence run, or restart it after the last voiced frame
+                    if trailing_silence == n_frames:
+                        silence_counter += n_frames
                     else:
-                        silence_counter = 0
+                        silence_counter = trailing_silence
 
                     # Process audio when we have enough data and detect silence
-                    if len(audio_buffer) > 20 and silence_counter > silence_threshold:
-                        # Combine audio buffer
-                        combined_audio = b''.join(audio_buffer)
-
-                        # Process in separate thread to avoid blocking
-                        self.executor.submit(self._process_audio_buffer, combined_audio)
+                    if write > min_segment_bytes and silence_counter > silence_threshold:
+                        # Transcribe on the worker thread; it owns the buffer until it is released
+                        self._enqueue_segment((ring, write))
 
-                        # Reset buffer
-                        audio_buffer = []
+                        # Continue capturing into a fresh buffer
+                        ring = self._take_buffer()
+                        write = 0
                         silence_counter = 0
 
-                    # Prevent buffer from growing too large
-                    if len(audio_buffer) > 100:
-                        audio_buffer = audio_buffer[-50:]
-
                 except Exception as e:
-                    print(f"Error reading audio: {e}")
+                    log.error("Error processing audio: %s", e)
                     time.sleep(0.1)
 
         except Exception as e:
-            print(f"Error in audio stream: {e}")
+            log.error(f"Error in audio stream: {e}")
         finally:
-            if stream:
-                stream.stop_stream()
-                stream.close()
+            if subscribed:
+                self.source.unsubscribe(self._on_audio)
+            if ring is not None:
+                self._free_buffers.put(ring)
+
+    def _take_buffer(self) -> bytearray:
+        """Get a segment buffer from the pool, allocating only if all are in use"""
+        try:
+            return self._free_buffers.get_nowait()
+        except queue.Empty:
+            return bytearray(self._segment_bytes)
+
+    def _enqueue_segment(self, segment: tuple):
+        """Queue a (buffer, length) segment for transcription, dropping the oldest pending one when full"""
+        while True:
+            try:
+                self._jobs.put_nowait(segment)
+                return
+            except queue.Full:
+                try:
+                    dropped, _ = self._jobs.get_nowait()
+                    self._free_buffers.put(dropped)
+                    log.warning("Transcription backlog full, dropping oldest segment")
+                except queue.Empty:
+                    pass
+
+    def _transcription_loop(self):
+        """Transcribe queued segments one at a time"""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                # Shutdown sentinel from close()
+                break
+            buffer, length = job
+            try:
+                self._process_audio_buffer(memoryview(buffer)[:length])
+            finally:
+                self._free_buffers.put(buffer)
 
     def _process_audio_buffer(self, audio_data):
         """Process audio buffer and transcribe"""
         try:
-            # Create AudioData object for speech recognition
-            audio_data_obj = sr.AudioData(
-                audio_data,
-                Config.AUDIO_RATE,
-                2  # 2 bytes per sample for 16-bit audio
-            )
-
-            # Transcribe using Google Speech Recognition with language support
-            text = self.recognizer.recognize_google(audio_data_obj, language=self.language)
+            # Upload the raw 16-bit PCM segment with language support
+            text = self.speech.recognize(audio_data, Config.AUDIO_RATE, language=self.language)
             if text.strip():
-                print(f"Transcribed system audio ({self.language}): {text}")
+                log.info(f"Transcribed system audio ({self.language}): {text}")
                 # Use thread-safe callback
                 self._safe_callback(text)
 
@@ -201,99 +547,53 @@ class AudioHandler:
             # No speech detected - this is normal
             pass
         except sr.RequestError as e:
-            print(f"Speech recognition error: {e}")
+            log.error(f"Speech recognition error: {e}")
         except Exception as e:
-            print(f"Transcription error: {e}")
+            log.error(f"Transcription error: {e}")
 
     def _safe_callback(self, text: str):
         """Thread-safe callback that handles async functions properly"""
         try:
-            # Check if we're in an async context
-            try:
-                loop = asyncio.get_running_loop()
-                # If we have a running loop, schedule the callback
-                if asyncio.iscoroutinefunction(self.on_transcription):
-                    asyncio.run_coroutine_threadsafe(self.on_transcription(text), loop)
-                else:
-                    loop.call_soon_threadsafe(self.on_transcription, text)
-            except RuntimeError:
-                # No running loop, call directly if it's not a coroutine
-                if not asyncio.iscoroutinefunction(self.on_transcription):
-                    self.on_transcription(text)
-                else:
-                    # Need to run in new event loop
-                    try:
-                        asyncio.run(self.on_transcription(text))
-                    except Exception as e:
-                        print(f"Error in async callback: {e}")
+            if not self._callback_is_coroutine:
+                self.on_transcription(text)
+            elif self.loop is not None:
+                asyncio.run_coroutine_threadsafe(self.on_transcription(text), self.loop)
+            else:
+                # No loop to schedule onto; run in a new event loop
+                asyncio.run(self.on_transcription(text))
         except Exception as e:
-            print(f"Error in callback: {e}")
+            log.error(f"Error in callback: {e}")
 
     def __del__(self):
         """Cleanup audio resources"""
-        if hasattr(self, 'audio'):
-            self.audio.terminate()
-        if hasattr(self, 'executor'):
-            self.executor.shutdown(wait=False)
+        if hasattr(self, 'speech'):
+            self.speech.close()
 
 
 class AudioRecorder:
     """Enhanced recorder for system audio capture with more control"""
 
-    def __init__(self, on_audio_chunk: Callable[[bytes], None]):
+    def __init__(self, on_audio_chunk: Callable[[bytes], None], source: Optional[SystemAudioSource] = None):
         self.on_audio_chunk = on_audio_chunk
         self.is_recording = False
-        self.audio = pyaudio.PyAudio()
-        self.stream = None
-        self.system_audio_device = None
-        self._find_system_audio_device()
-
-    def _find_system_audio_device(self):
-        """Find the system audio output device"""
-        for i in range(self.audio.get_device_count()):
-            device_info = self.audio.get_device_info_by_index(i)
-            device_name = device_info['name'].lower()
-
-            if (device_info['maxInputChannels'] > 0 and
-                    ('stereo mix' in device_name or 'loopback' in device_name or
-                     'what u hear' in device_name)):
-                self.system_audio_device = i
-                break
-
-        if self.system_audio_device is None:
-            self.system_audio_device = self.audio.get_default_input_device_info()['index']
+        # Pass the AudioHandler's source to share one capture stream between both
+        self.source = source or SystemAudioSource()
 
     def start_recording(self):
         """Start recording system audio"""
         if not self.is_recording:
             self.is_recording = True
-            self.stream = self.audio.open(
-                format=pyaudio.paInt16,
-                channels=Config.AUDIO_CHANNELS,
-                rate=Config.AUDIO_RATE,
-                input=True,
-                input_device_index=self.system_audio_device,
-                frames_per_buffer=Config.AUDIO_CHUNK_SIZE,
-                stream_callback=self._audio_callback
-            )
-            self.stream.start_stream()
-            print("Started recording system audio...")
+            self.source.subscribe(self._audio_callback)
+            log.info("Started recording system audio...")
 
     def stop_recording(self):
         """Stop recording system audio"""
         if self.is_recording:
             self.is_recording = False
-            if self.stream:
-                self.stream.stop_stream()
-                self.stream.close()
-            print("Stopped recording system audio.")
+            self.source.unsubscribe(self._audio_callback)
+            log.info("Stopped recording system audio.")
 
-    def _audio_callback(self, in_data, frame_count, time_info, status):
-        """Callback for audio stream"""
+    def _audio_callback(self, in_data: bytes):
+        """Audio source subscriber"""
         if self.is_recording:
             self.on_audio_chunk(in_data)
-        return (in_data, pyaudio.paContinue)
-
-    def __del__(self):
-        if hasattr(self, 'audio'):
-            self.audio.terminate()
\ No newline at end of file
@@ -35,18 +35,52 @@ class Config:
     GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-preview-05-20")
 
     # Audio Configuration
-    AUDIO_CHUNK_SIZE = 4096
+    AUDIO_CHUNK_SIZE = 1024  # 64 ms at 16 kHz; must be a power of two (aligned SIMD/FFT-friendly buffers)
     AUDIO_FORMAT = 16
     AUDIO_CHANNELS = 1
     AUDIO_RATE = 16000
+    # Native capture format; multi-channel / higher-rate input (e.g. stereo 48 kHz WASAPI
+    # loopback) is downmixed and decimated to AUDIO_CHANNELS / AUDIO_RATE in one pass
+    AUDIO_CAPTURE_CHANNELS = int(os.getenv("AUDIO_CAPTURE_CHANNELS", 1))
+    AUDIO_CAPTURE_RATE = int(os.getenv("AUDIO_CAPTURE_RATE", 16000))  # Integer multiple of AUDIO_RATE
 
     # Real-time processing
     SILENCE_THRESHOLD = 200
     SILENCE_DURATION = 1.5
+    VAD_FRAME_SIZE = 128  # Samples per silence-detection frame (8 ms at 16 kHz)
+
+    # Audio thread scheduling (best effort; raising priority may need elevated privileges)
+    AUDIO_THREAD_CPU = int(os.getenv("AUDIO_THREAD_CPU")) if os.getenv("AUDIO_THREAD_CPU") else None
+    AUDIO_THREAD_REALTIME = os.getenv("AUDIO_THREAD_REALTIME", "false").lower() == "true"  # SCHED_FIFO on Linux, TIME_CRITICAL on Windows
+
+    # Bounds for a buffered speech segment, in seconds of audio
+    MIN_SEGMENT_DURATION = 5.0   # Don't transcribe shorter segments
+    MAX_SEGMENT_DURATION = 25.0  # Capture buffer capacity; oldest half is dropped when full
+
+    # HTTP connection pool for the aiohttp-based LLM clients (Ollama, Cohere, HuggingFace)
+    AIOHTTP_CONN_LIMIT = int(os.getenv("AIOHTTP_CONN_LIMIT", 1024))
+    AIOHTTP_LIMIT_PER_HOST = int(os.getenv("AIOHTTP_LIMIT_PER_HOST", 256))
+    AIOHTTP_READ_BUFSIZE = int(os.getenv("AIOHTTP_READ_BUFSIZE", 4 * 1024 * 1024))  # Default 64 KiB stalls large streamed chunks
+
+    # Concurrent requests per client in get_batch_responses()
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
 
     # Server Configuration
     HOST = os.getenv("HOST", "localhost")
     PORT = int(os.getenv("PORT", 8000))
+    WORKERS = int(os.getenv("WEB_CONCURRENCY", 1))  # >1 only in API-only mode
+    API_ONLY = os.getenv("API_ONLY", "false").lower() == "true"  # Serve without audio capture (also --api-only)
+    # uvicorn implementations; "auto" picks uvloop / httptools / websockets when installed
+    UVICORN_LOOP = os.getenv("UVICORN_LOOP", "auto")
+    UVICORN_HTTP = os.getenv("UVICORN_HTTP", "auto")
+    UVICORN_WS = os.getenv("UVICORN_WS", "auto")
+    # Off by default: frames are small, and each connection would hold its own zlib contexts
+    WS_PER_MESSAGE_DEFLATE = os.getenv("WS_PER_MESSAGE_DEFLATE", "false").lower() == "true"
+    WS_RECEIVE_QUEUE_SIZE = 32  # Decoded inbound messages buffered per client before reading pauses
+    WS_SEND_QUEUE_SIZE = 256  # Pending outbound frames per client before it's dropped as too slow
+    WS_SEND_BATCH_MAX = 64  # Queued frames a lagging client may receive combined into one batch frame
+    WS_SEND_TIMEOUT = 5.0  # Seconds a single frame write may take before the client is dropped
+    WS_CHUNK_FLUSH_INTERVAL = 0.03  # Seconds of streamed LLM output coalesced into one response_chunk frame
 
     # UI Configuration
     UI_TITLE = "Real-Time AI Audio Assistant"
@@ -73,6 +107,13 @@ class Config:
     # Default model for new connections
     DEFAULT_MODEL_ID = f"groq/{GROQ_MODEL}"
     
+    # Messages kept per conversation; the window grows to twice this before older
+    # messages are dropped, so the prompt prefix only changes every few turns
+    CONVERSATION_HISTORY_SIZE = 10
+    # Hard cap on stored messages per connection; must stay above every client's 2x
+    # window (2 * CONVERSATION_HISTORY_SIZE at most) so no window loses context
+    MAX_HISTORY_MESSAGES = 4 * CONVERSATION_HISTORY_SIZE
+    
     # Model-specific performance tuning for real-time processing
     MODEL_CONFIG = {
         "groq": {
@@ -105,6 +146,12 @@ class Config:
             "max_tokens": 1500,
             "temperature": 0.7
         },
+        "huggingface": {
+            "realtime_processing_lag_ms": 500,
+            "silence_threshold_ms": 1500,
+            "max_tokens": 200,                  # Inference API limits new tokens
+            "temperature": 0.7
+        },
         "default": {  # Fallback for any unspecified models
             "realtime_processing_lag_ms": 500,
             "silence_threshold_ms": 1500,
@@ -113,8 +160,33 @@ class Config:
         }
     }
     
+    @staticmethod
+    def get_provider_config(provider: str) -> dict:
+        """Get performance config for a provider name"""
+        return Config.MODEL_CONFIG.get(provider, Config.MODEL_CONFIG["default"])
+
     @staticmethod
     def get_model_config(model_id: str) -> dict:
         """Get performance config for a given model_id"""
-        provider = model_id.split('/')[0] if '/' in model_id else 'default'
-        return Config.MODEL_CONFIG.get(provider, Config.MODEL_CONFIG["default"])
\ No newline at end of file
+        config = Config._MODEL_CONFIG_BY_ID.get(model_id)
+        if config is None:
+            provider = model_id.split('/')[0] if '/' in model_id else 'default'
+            config = Config.get_provider_config(provider)
+        return config
+
+
+# Set of selectable model ids, for O(1) validation (AVAILABLE_MODELS isn't changed at runtime)
+Config.ALLOWED_MODEL_IDS = frozenset(Config.AVAILABLE_MODELS.values())
+
+# model_id -> user-facing name; reversed so the first name listed for an id wins
+Config.MODEL_DISPLAY_NAMES = {
+    model_id: display_name
+    for display_name, model_id in reversed(list(Config.AVAILABLE_MODELS.items()))
+}
+
+# Resolve the selectable models once so lookups don't re-parse the model_id.
+# The dicts are shared; callers must not modify them.
+Config._MODEL_CONFIG_BY_ID = {
+    model_id: Config.get_provider_config(model_id.split('/')[0])
+    for model_id in Config.AVAILABLE_MODELS.values()
+}
@@ -0,0 +1,22 @@
+"""JSON helpers backed by orjson when it is installed, stdlib json otherwise"""
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+    loads = orjson.loads  # Accepts bytes directly, no decode step
+    JSONDecodeError = orjson.JSONDecodeError
+
+    def dumps(obj) -> bytes:
+        """Serialize to UTF-8 JSON bytes"""
+        return orjson.dumps(obj)
+
+except ImportError:
+    import json
+
+    ORJSON_AVAILABLE = False
+    loads = json.loads  # Also accepts UTF-8 bytes
+    JSONDecodeError = json.JSONDecodeError
+
+    def dumps(obj) -> bytes:
+        """Serialize to UTF-8 JSON bytes"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
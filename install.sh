@@ -29,6 +29,19 @@ pip install --upgrade pip
 echo "📥 Installing Python packages..."
 pip install -r requirements.txt
 
+# Bundle the web UI's JavaScript libraries so the page can load them from this server
+echo "📥 Downloading web UI libraries..."
+mkdir -p vendor
+if curl -fsSL https://cdn.jsdelivr.net/npm/markdown-it@14.1.0/dist/markdown-it.min.js -o vendor/markdown-it.min.js &&
+   curl -fsSL https://cdn.jsdelivr.net/npm/dompurify@3.1.6/dist/purify.min.js -o vendor/purify.min.js &&
+   curl -fsSL "https://cdn.jsdelivr.net/npm/@msgpack/msgpack@2.8.0/dist.es5+umd/msgpack.min.js" -o vendor/msgpack.min.js; then
+    # One file, one request; each library is a self-contained script
+    { cat vendor/markdown-it.min.js; echo ";"; cat vendor/purify.min.js; echo ";"; cat vendor/msgpack.min.js; } > vendor/ui-libs.js
+    echo "✅ Web UI libraries bundled in vendor/ui-libs.js"
+else
+    echo "⚠️ Could not download the web UI libraries; the page will load them from the CDN"
+fi
+
 # Check if .env file exists
 if [ ! -f .env ]; then
     echo "⚙️ Creating .env file from template..."
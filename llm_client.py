@@ -1,23 +1,200 @@
-import openai
 import asyncio
+import logging
+import threading
 import aiohttp
-import json
+import fast_json
 from abc import ABC, abstractmethod
-from typing import Optional, AsyncGenerator
-import google.generativeai as genai
+from typing import Optional, AsyncGenerator, List, Tuple
 from config import Config
 
+log = logging.getLogger(__name__)
+
+# Provider SDKs (openai, google.generativeai) are imported when a client for that
+# provider is first created, so importing this module doesn't load every SDK.
+
+# Prompt constants shared by every client and request; treat as read-only
+_SYSTEM_PROMPT = "You are a helpful AI assistant. Respond conversationally to what the user says. Keep responses concise but helpful."
+_SYSTEM_MSG = {"role": "system", "content": _SYSTEM_PROMPT}
+_GEMINI_PROMPT_HEADER = _SYSTEM_PROMPT + "\n\n"
+_HF_PROMPT_HEADER = "You are a helpful AI assistant. Respond conversationally.\n\n"
+# Speaker labels for providers that take a flat text prompt
+_HUMAN = "Human: "
+_ASSISTANT = "Assistant: "
+_ROLE_PREFIX = {"system": "System: ", "user": _HUMAN, "assistant": _ASSISTANT}
+_CHAT_ROLE_PREFIX = {"user": _HUMAN, "assistant": _ASSISTANT}  # History turns only
+
+# Request bodies are serialized with fast_json and posted as raw bytes
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# One HTTP client shared by all OpenAI-compatible clients, so connections (and their
+# TLS sessions) survive across websocket connections and model switches
+_shared_http_client = None
+
+
+def get_shared_http_client():
+    """Return the process-wide keep-alive HTTP client, creating it on first use
+
+    Uses the OpenAI SDK's aiohttp transport (openai[aiohttp]) when available, far
+    faster than plain httpx under concurrent streams; falls back to httpx otherwise.
+    """
+    global _shared_http_client
+    if _shared_http_client is None:
+        import openai
+        try:
+            _shared_http_client = openai.DefaultAioHttpClient()
+        except (AttributeError, RuntimeError):
+            # Older SDK, or the httpx-aiohttp extra isn't installed
+            import httpx
+            try:
+                import h2  # noqa: F401  (httpx only speaks HTTP/2 when h2 is installed)
+                http2 = True
+            except ImportError:
+                http2 = False
+            _shared_http_client = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(max_keepalive_connections=20),
+                timeout=30.0
+            )
+    return _shared_http_client
+
+
+async def aclose_shared_http_client():
+    """Close the shared HTTP client (called on application shutdown)"""
+    global _shared_http_client
+    if _shared_http_client is not None:
+        await _shared_http_client.aclose()
+        _shared_http_client = None
+
+
+async def _iter_lines(content, chunk_size: int = 64 * 1024) -> AsyncGenerator[bytes, None]:
+    """Split a streamed body into lines from large reads instead of StreamReader line buffering"""
+    buffer = bytearray()
+    async for chunk in content.iter_chunked(chunk_size):
+        buffer += chunk
+        start = 0
+        # Slicing a view copies each line once, straight into bytes; the view is released
+        # before the buffer is resized below
+        with memoryview(buffer) as view:
+            while (newline := buffer.find(b"\n", start)) != -1:
+                yield bytes(view[start:newline])
+                start = newline + 1
+        # Drop consumed lines in one move rather than once per line
+        del buffer[:start]
+    if buffer:
+        yield bytes(buffer)
+
+
+def _format_chat_prompt(header: str, history: list, text: str) -> str:
+    """Render history and the new user turn as a Human/Assistant transcript"""
+    parts = [header]
+    for msg in history:
+        prefix = _CHAT_ROLE_PREFIX.get(msg["role"])
+        if prefix:
+            parts += (prefix, msg["content"], "\n")
+    parts += (_HUMAN, text, "\nAssistant:")
+    return "".join(parts)
+
+
+class ConversationWindow:
+    """Append-only conversation history whose visible window only moves in jumps
+
+    Providers cache prompt prefixes, and a sliding window changes the first message on
+    every turn. Instead the window grows to twice the kept size, then jumps forward to
+    the most recent `keep` messages, so most turns resend an identical prefix.
+
+    The history belongs to the connection, not to one client: each `keep` size has its
+    own window start, and viewing never removes messages another window still needs.
+    """
+
+    def __init__(self, max_messages: int = Config.MAX_HISTORY_MESSAGES):
+        self._messages = []
+        self.max_messages = max_messages
+        self._dropped = 0  # Messages removed from the front by the cap
+        self._starts = {}  # keep -> absolute index where that window starts
+
+    def append(self, message: dict):
+        self._messages.append(message)
+        excess = len(self._messages) - self.max_messages
+        if excess > 0:
+            # The only place messages are discarded
+            del self._messages[:excess]
+            self._dropped += excess
+
+    def view(self, keep: int) -> list:
+        """Messages visible to a client that keeps `keep` messages"""
+        end = self._dropped + len(self._messages)
+        start = max(self._starts.get(keep, 0), self._dropped)
+        if end - start > 2 * keep:
+            # Jump this window forward; the messages stay for larger windows
+            start = end - keep
+            self._starts[keep] = start
+        return self._messages[start - self._dropped:]
+
+    def __len__(self):
+        return len(self._messages)
+
 
 class BaseLLMClient(ABC):
     """Abstract base class for all LLM clients"""
+
+    provider = "default"  # Key into Config.MODEL_CONFIG
+    history_size = Config.CONVERSATION_HISTORY_SIZE  # Messages kept when the history window jumps
     
     def __init__(self, model: str, api_key: str = None):
         self.model = model
         self.api_key = api_key
         if api_key is not None and not api_key:
             raise ValueError(f"API key for {self.__class__.__name__} is not set")
+        # Generation settings are resolved once per client; _initialize_client binds
+        # the provider-specific request parameters from them
+        model_config = Config.get_provider_config(self.provider)
+        self.max_tokens = model_config["max_tokens"]
+        self.temperature = model_config["temperature"]
+        # Long-lived aiohttp session for the REST-based providers, created on first use
+        self._session: Optional[aiohttp.ClientSession] = None
         self._initialize_client()
     
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return this client's pooled aiohttp session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=Config.AIOHTTP_CONN_LIMIT,
+                    limit_per_host=Config.AIOHTTP_LIMIT_PER_HOST,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=75,
+                    enable_cleanup_closed=True
+                ),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10),
+                read_bufsize=Config.AIOHTTP_READ_BUFSIZE
+            )
+        return self._session
+    
+    async def aclose(self):
+        """Release pooled connections held by this client"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def get_batch_responses(self, items: List[Tuple[str, list]]) -> List[str]:
+        """Collect full responses for many (text, conversation_history) pairs concurrently
+
+        At most Config.LLM_MAX_CONCURRENCY requests are in flight; results keep input order.
+        """
+        semaphore = asyncio.Semaphore(Config.LLM_MAX_CONCURRENCY)
+        
+        async def respond(text, history):
+            async with semaphore:
+                return "".join([chunk async for chunk in self.get_streaming_response(text, history)])
+        
+        return await asyncio.gather(*(respond(text, history) for text, history in items))
+    
     @abstractmethod
     def _initialize_client(self):
         """Provider-specific client initialization"""
@@ -28,84 +205,145 @@ class BaseLLMClient(ABC):
         """Generate streaming response from the LLM"""
         pass
     
+    def _history_window(self, conversation_history) -> list:
+        """Prior messages to send, as a prefix that stays stable across turns"""
+        if not conversation_history:
+            return []
+        if isinstance(conversation_history, ConversationWindow):
+            return conversation_history.view(self.history_size)
+        return list(conversation_history)[-self.history_size:]
+    
     def _build_messages(self, text: str, conversation_history: list = None) -> list:
         """Build message array for API call"""
-        messages = [
-            {
-                "role": "system",
-                "content": "You are a helpful AI assistant. Respond conversationally to what the user says. Keep responses concise but helpful."
-            }
-        ]
-        
-        if conversation_history:
-            messages.extend(conversation_history[-10:])
-        
-        messages.append({"role": "user", "content": text})
-        return messages
+        # Anything dynamic goes after the system message so the cached prefix stays static
+        history = self._history_window(conversation_history)
+        if history:
+            return [_SYSTEM_MSG, *history, {"role": "user", "content": text}]
+        return [_SYSTEM_MSG, {"role": "user", "content": text}]
 
 
 class OpenAIClient(BaseLLMClient):
     """OpenAI LLM client implementation"""
+
+    provider = "openai"
     
     def _initialize_client(self):
-        self.client = openai.AsyncOpenAI(api_key=self.api_key)
+        import openai
+        self.client = openai.AsyncOpenAI(api_key=self.api_key, http_client=get_shared_http_client())
+        self._request_kwargs = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "stream": True
+        }
     
     async def get_streaming_response(self, text: str, conversation_history: list = None) -> AsyncGenerator[str, None]:
         """Get streaming response from OpenAI API"""
         messages = self._build_messages(text, conversation_history)
         
         try:
-            stream = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=1500,
-                temperature=0.7,
-                stream=True
-            )
+            stream = await self.client.chat.completions.create(messages=messages, **self._request_kwargs)
             
             async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
         except Exception as e:
             yield f"OpenAI Error: {str(e)}"
+    
+    async def get_batch_responses(self, items: List[Tuple[str, list]], use_batch_api: bool = False,
+                                  poll_interval: float = 30.0) -> List[str]:
+        """Concurrent requests by default; use_batch_api=True submits one /v1/batches job instead
+
+        The Batch API is billed at a discount but may take up to 24h, so it suits offline workloads only.
+        """
+        if not use_batch_api:
+            return await super().get_batch_responses(items)
+        
+        request_body = {"model": self.model, "max_tokens": self.max_tokens, "temperature": self.temperature}
+        lines = [
+            fast_json.dumps({
+                "custom_id": str(index),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {**request_body, "messages": self._build_messages(text, history)}
+            })
+            for index, (text, history) in enumerate(items)
+        ]
+        batch_file = await self.client.files.create(file=("batch.jsonl", b"\n".join(lines)), purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"OpenAI batch {batch.id} ended with status {batch.status}")
+        
+        output = await self.client.files.content(batch.output_file_id)
+        results = [""] * len(items)
+        for line in output.content.splitlines():
+            if not line:
+                continue
+            record = fast_json.loads(line)
+            choices = ((record.get("response") or {}).get("body") or {}).get("choices")
+            if choices:
+                results[int(record["custom_id"])] = choices[0]["message"].get("content") or ""
+        return results
 
 
 class GroqClient(BaseLLMClient):
     """Groq LLM client implementation"""
+
+    provider = "groq"
     
     def _initialize_client(self):
+        import openai
         self.client = openai.AsyncOpenAI(
             api_key=self.api_key,
-            base_url="https://api.groq.com/openai/v1"
+            base_url="https://api.groq.com/openai/v1",
+            http_client=get_shared_http_client()
         )
+        self._request_kwargs = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "top_p": 0.9,
+            "stream": True
+        }
     
     async def get_streaming_response(self, text: str, conversation_history: list = None) -> AsyncGenerator[str, None]:
         """Get streaming response from Groq API"""
         messages = self._build_messages(text, conversation_history)
         
         try:
-            stream = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=2000,
-                temperature=0.6,
-                top_p=0.9,
-                stream=True
-            )
+            stream = await self.client.chat.completions.create(messages=messages, **self._request_kwargs)
             
             async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
         except Exception as e:
             yield f"Groq Error: {str(e)}"
 
 
 class GeminiClient(BaseLLMClient):
     """Google Gemini LLM client implementation"""
+
+    provider = "gemini"
+    history_size = 6
     
     def _initialize_client(self):
+        import google.generativeai as genai
         genai.configure(api_key=self.api_key)
         self.client = genai.GenerativeModel(self.model)
+        self._generation_config = genai.types.GenerationConfig(
+            max_output_tokens=self.max_tokens,
+            temperature=self.temperature
+        )
     
     async def get_streaming_response(self, text: str, conversation_history: list = None) -> AsyncGenerator[str, None]:
         """Get streaming response from Gemini API"""
@@ -114,41 +352,72 @@ class GeminiClient(BaseLLMClient):
             prompt = self._build_gemini_prompt(text, conversation_history)
             
             # Generate streaming response
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self.client.generate_content(
+            if hasattr(self.client, "generate_content_async"):
+                response = await self.client.generate_content_async(
                     prompt,
                     stream=True,
-                    generation_config=genai.types.GenerationConfig(
-                        max_output_tokens=2000,
-                        temperature=0.6
-                    )
+                    generation_config=self._generation_config
                 )
-            )
-            
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
+                async for chunk in response:
+                    if chunk.text:
+                        yield chunk.text
+            else:
+                async for chunk_text in self._stream_in_thread(prompt):
+                    yield chunk_text
         except Exception as e:
             yield f"Gemini Error: {str(e)}"
     
-    def _build_gemini_prompt(self, text: str, conversation_history: list = None) -> str:
-        """Build prompt for Gemini API"""
-        prompt = "You are a helpful AI assistant. Respond conversationally to what the user says. Keep responses concise but helpful.\n\n"
+    async def _stream_in_thread(self, prompt: str) -> AsyncGenerator[str, None]:
+        """Run the blocking SDK stream on a worker thread and relay its chunks to the loop"""
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        done = object()
+        # Set when the consumer goes away, so the worker stops reading the stream early
+        stop = threading.Event()
         
-        if conversation_history:
-            for msg in conversation_history[-6:]:
-                if msg["role"] == "user":
-                    prompt += f"Human: {msg['content']}\n"
-                elif msg["role"] == "assistant":
-                    prompt += f"Assistant: {msg['content']}\n"
+        def produce():
+            try:
+                for chunk in self.client.generate_content(prompt, stream=True, generation_config=self._generation_config):
+                    if stop.is_set():
+                        return
+                    if chunk.text:
+                        loop.call_soon_threadsafe(chunks.put_nowait, chunk.text)
+            except Exception as e:
+                if not stop.is_set():
+                    loop.call_soon_threadsafe(chunks.put_nowait, e)
+            finally:
+                if not stop.is_set():
+                    loop.call_soon_threadsafe(chunks.put_nowait, done)
         
-        prompt += f"Human: {text}\nAssistant:"
-        return prompt
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        finished = False
+        try:
+            while True:
+                item = await chunks.get()
+                if item is done:
+                    finished = True
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            if finished:
+                await producer
+            else:
+                # Cancelled, closed early or failed: don't wait out the rest of the reply;
+                # the worker sees the event at its next chunk and exits
+                producer.cancel()
+    
+    def _build_gemini_prompt(self, text: str, conversation_history: list = None) -> str:
+        """Build prompt for Gemini API"""
+        return _format_chat_prompt(_GEMINI_PROMPT_HEADER, self._history_window(conversation_history), text)
 
 
 class OllamaClient(BaseLLMClient):
     """Ollama local LLM client implementation"""
+
+    provider = "ollama"
     
     def __init__(self, model: str, base_url: str = None):
         self.base_url = base_url or Config.OLLAMA_BASE_URL
@@ -156,7 +425,10 @@ class OllamaClient(BaseLLMClient):
     
     def _initialize_client(self):
         # No client initialization needed for Ollama
-        pass
+        self._options = {
+            "temperature": self.temperature,
+            "num_predict": self.max_tokens
+        }
     
     async def get_streaming_response(self, text: str, conversation_history: list = None) -> AsyncGenerator[str, None]:
         """Get streaming response from local Ollama instance"""
@@ -164,170 +436,214 @@ class OllamaClient(BaseLLMClient):
             messages = self._build_messages(text, conversation_history)
             prompt = self._messages_to_prompt(messages)
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/api/generate",
-                    json={
-                        "model": self.model,
-                        "prompt": prompt,
-                        "stream": True,
-                        "options": {
-                            "temperature": 0.7,
-                            "num_predict": 1000
-                        }
-                    }
-                ) as response:
-                    async for line in response.content:
-                        if line:
-                            try:
-                                chunk = json.loads(line.decode('utf-8'))
-                                if 'response' in chunk:
-                                    yield chunk['response']
-                            except json.JSONDecodeError:
-                                continue
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_url}/api/generate",
+                headers=_JSON_HEADERS,
+                data=fast_json.dumps({
+                    "model": self.model,
+                    "prompt": prompt,
+                    "stream": True,
+                    "options": self._options
+                })
+            ) as response:
+                async for line in _iter_lines(response.content):
+                    if line:
+                        try:
+                            token = fast_json.loads(line).get('response')
+                            if token is not None:
+                                yield token
+                        except fast_json.JSONDecodeError:
+                            continue
         except Exception as e:
             yield f"Ollama Error: {str(e)}"
     
     def _messages_to_prompt(self, messages: list) -> str:
         """Convert messages to a single prompt for Ollama"""
-        prompt = ""
+        parts = []
         for msg in messages:
-            if msg["role"] == "system":
-                prompt += f"System: {msg['content']}\n\n"
-            elif msg["role"] == "user":
-                prompt += f"Human: {msg['content']}\n\n"
-            elif msg["role"] == "assistant":
-                prompt += f"Assistant: {msg['content']}\n\n"
+            prefix = _ROLE_PREFIX.get(msg["role"])
+            if prefix:
+                parts += (prefix, msg["content"], "\n\n")
         
-        prompt += "Assistant: "
-        return prompt
+        parts.append(_ASSISTANT)
+        return "".join(parts)
+
+
+_COHERE_TEXT_EVENT = b"text-generation"
 
 
 class CohereClient(BaseLLMClient):
     """Cohere LLM client implementation"""
+
+    provider = "cohere"
+    history_size = 6
     
     def _initialize_client(self):
-        # No specific client initialization needed
-        pass
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
     
     async def get_streaming_response(self, text: str, conversation_history: list = None) -> AsyncGenerator[str, None]:
         """Get streaming response from Cohere API"""
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
             # Build conversation context for Cohere
             chat_history = []
-            if conversation_history:
-                for msg in conversation_history[-6:]:
-                    if msg["role"] == "user":
-                        chat_history.append({"role": "USER", "message": msg["content"]})
-                    elif msg["role"] == "assistant":
-                        chat_history.append({"role": "CHATBOT", "message": msg["content"]})
+            for msg in self._history_window(conversation_history):
+                if msg["role"] == "user":
+                    chat_history.append({"role": "USER", "message": msg["content"]})
+                elif msg["role"] == "assistant":
+                    chat_history.append({"role": "CHATBOT", "message": msg["content"]})
             
             payload = {
                 "message": text,
                 "model": self.model,
                 "chat_history": chat_history,
-                "temperature": 0.7,
-                "max_tokens": 1500,
+                "temperature": self.temperature,
+                "max_tokens": self.max_tokens,
                 "stream": True
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.cohere.ai/v1/chat",
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    async for line in response.content:
-                        if line:
-                            try:
-                                chunk = json.loads(line.decode('utf-8'))
-                                if chunk.get("event_type") == "text-generation":
-                                    yield chunk.get("text", "")
-                            except json.JSONDecodeError:
-                                continue
+            session = await self._get_session()
+            async with session.post(
+                "https://api.cohere.ai/v1/chat",
+                headers=self._headers,
+                data=fast_json.dumps(payload)
+            ) as response:
+                async for line in _iter_lines(response.content):
+                    # Most events aren't text; skip them without parsing
+                    if _COHERE_TEXT_EVENT not in line:
+                        continue
+                    try:
+                        get = fast_json.loads(line).get
+                        if get("event_type") == "text-generation":
+                            yield get("text", "")
+                    except fast_json.JSONDecodeError:
+                        continue
         except Exception as e:
             yield f"Cohere Error: {str(e)}"
 
 
 class HuggingFaceClient(BaseLLMClient):
     """HuggingFace LLM client implementation"""
+
+    provider = "huggingface"
+    history_size = 4
     
     def _initialize_client(self):
-        # No specific client initialization needed
-        pass
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        self._parameters = {
+            "max_new_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "do_sample": True,
+            "return_full_text": False
+        }
     
     async def get_streaming_response(self, text: str, conversation_history: list = None) -> AsyncGenerator[str, None]:
-        """Get streaming response from HuggingFace API (simulated streaming)"""
+        """Get streaming response from HuggingFace API"""
         try:
             # Build conversational prompt
             prompt = self._build_hf_prompt(text, conversation_history)
             
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
             payload = {
                 "inputs": prompt,
-                "parameters": {
-                    "max_new_tokens": 200,
-                    "temperature": 0.7,
-                    "do_sample": True,
-                    "return_full_text": False
-                }
+                "parameters": self._parameters,
+                "stream": True
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"https://api-inference.huggingface.co/models/{self.model}",
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        if isinstance(result, list) and len(result) > 0:
-                            response_text = result[0].get("generated_text", "No response generated")
-                        else:
-                            response_text = str(result)
-                        
-                        # Simulate streaming by yielding words
-                        words = response_text.split()
-                        for word in words:
-                            yield word + " "
-                            await asyncio.sleep(0.05)  # Small delay for streaming effect
+            session = await self._get_session()
+            async with session.post(
+                f"https://api-inference.huggingface.co/models/{self.model}",
+                headers=self._headers,
+                data=fast_json.dumps(payload)
+            ) as response:
+                if response.status == 200 and response.content_type == "text/event-stream":
+                    # text-generation-inference streams one `data: {...}` frame per token
+                    async for line in _iter_lines(response.content):
+                        if not line.startswith(b"data:"):
+                            continue
+                        try:
+                            token = fast_json.loads(line[5:]).get("token") or {}
+                        except fast_json.JSONDecodeError:
+                            continue
+                        if token.get("text") and not token.get("special"):
+                            yield token["text"]
+                elif response.status == 200:
+                    # Models that don't support streaming return the whole generation at once
+                    result = await response.json()
+                    if isinstance(result, list) and len(result) > 0:
+                        response_text = result[0].get("generated_text", "No response generated")
                     else:
-                        error_text = await response.text()
-                        yield f"HuggingFace Error: {response.status} - {error_text}"
+                        response_text = str(result)
+                    
+                    for start in range(0, len(response_text), 64):
+                        yield response_text[start:start + 64]
+                else:
+                    error_text = await response.text()
+                    yield f"HuggingFace Error: {response.status} - {error_text}"
         except Exception as e:
             yield f"HuggingFace Error: {str(e)}"
     
     def _build_hf_prompt(self, text: str, conversation_history: list = None) -> str:
         """Build prompt for HuggingFace models"""
-        prompt = "You are a helpful AI assistant. Respond conversationally.\n\n"
-        
-        if conversation_history:
-            for msg in conversation_history[-4:]:
-                if msg["role"] == "user":
-                    prompt += f"Human: {msg['content']}\n"
-                elif msg["role"] == "assistant":
-                    prompt += f"Assistant: {msg['content']}\n"
-        
-        prompt += f"Human: {text}\nAssistant:"
-        return prompt
+        return _format_chat_prompt(_HF_PROMPT_HEADER, self._history_window(conversation_history), text)
+
+
+# provider -> (client class, Config attribute holding its API key, or None if keyless)
+_PROVIDERS = {
+    "openai": (OpenAIClient, "OPENAI_API_KEY"),
+    "groq": (GroqClient, "GROQ_API_KEY"),
+    "gemini": (GeminiClient, "GEMINI_API_KEY"),
+    "ollama": (OllamaClient, None),
+    "cohere": (CohereClient, "COHERE_API_KEY"),
+    "huggingface": (HuggingFaceClient, "HUGGINGFACE_API_KEY"),
+}
+
+# provider -> Config attribute naming the model used by the legacy LLM_PROVIDER setting
+_LEGACY_MODEL_SETTINGS = {
+    "openai": "OPENAI_MODEL",
+    "groq": "GROQ_MODEL",
+    "gemini": "GEMINI_MODEL",
+    "ollama": "OLLAMA_MODEL",
+    "cohere": "COHERE_MODEL",
+    "huggingface": "HUGGINGFACE_MODEL",
+}
+
+# Clients hold no per-conversation state, so one instance (and its connection pool)
+# per model_id is shared by every websocket connection
+_clients: dict = {}
 
 
 # Factory function to create LLM clients
 def create_llm_client(model_id: str) -> BaseLLMClient:
     """
-    Factory function to create an LLM client instance.
+    Factory function to get the shared LLM client instance for a model.
     model_id should be in format 'provider/model_name'
     """
-    if model_id not in Config.AVAILABLE_MODELS.values():
+    client = _clients.get(model_id)
+    if client is None:
+        client = _clients[model_id] = _build_llm_client(model_id)
+    return client
+
+
+async def aclose_llm_clients():
+    """Close every cached client's connections (called on application shutdown)"""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception as e:
+            log.warning("Error closing LLM client: %s", e, exc_info=e)
+
+
+def _build_llm_client(model_id: str) -> BaseLLMClient:
+    """Validate model_id and construct a new client for it"""
+    if model_id not in Config.ALLOWED_MODEL_IDS:
         raise ValueError(f"Model '{model_id}' is not allowed. Available models: {list(Config.AVAILABLE_MODELS.values())}")
     
     try:
@@ -335,55 +651,25 @@ def create_llm_client(model_id: str) -> BaseLLMClient:
     except ValueError:
         raise ValueError(f"Invalid model_id format. Expected 'provider/model_name', got '{model_id}'")
     
-    if provider == "openai":
-        if not Config.OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY is not set in environment variables")
-        return OpenAIClient(model=model_name, api_key=Config.OPENAI_API_KEY)
-    
-    elif provider == "groq":
-        if not Config.GROQ_API_KEY:
-            raise ValueError("GROQ_API_KEY is not set in environment variables")
-        return GroqClient(model=model_name, api_key=Config.GROQ_API_KEY)
-    
-    elif provider == "gemini":
-        if not Config.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY is not set in environment variables")
-        return GeminiClient(model=model_name, api_key=Config.GEMINI_API_KEY)
-    
-    elif provider == "ollama":
-        return OllamaClient(model=model_name, base_url=Config.OLLAMA_BASE_URL)
-    
-    elif provider == "cohere":
-        if not Config.COHERE_API_KEY:
-            raise ValueError("COHERE_API_KEY is not set in environment variables")
-        return CohereClient(model=model_name, api_key=Config.COHERE_API_KEY)
+    registration = _PROVIDERS.get(provider)
+    if registration is None:
+        raise ValueError(f"Unknown LLM provider: {provider}")
     
-    elif provider == "huggingface":
-        if not Config.HUGGINGFACE_API_KEY:
-            raise ValueError("HUGGINGFACE_API_KEY is not set in environment variables")
-        return HuggingFaceClient(model=model_name, api_key=Config.HUGGINGFACE_API_KEY)
+    client_class, api_key_setting = registration
+    if api_key_setting is None:
+        return client_class(model=model_name)
     
-    else:
-        raise ValueError(f"Unknown LLM provider: {provider}")
+    api_key = getattr(Config, api_key_setting)
+    if not api_key:
+        raise ValueError(f"{api_key_setting} is not set in environment variables")
+    return client_class(model=model_name, api_key=api_key)
 
 
 # Legacy compatibility function
 def create_llm_client_legacy() -> BaseLLMClient:
     """Create LLM client using legacy Config.LLM_PROVIDER setting"""
-    provider = Config.LLM_PROVIDER.lower()
-    
-    if provider == "openai":
-        return create_llm_client(f"openai/{Config.OPENAI_MODEL}")
-    elif provider == "groq":
-        return create_llm_client(f"groq/{Config.GROQ_MODEL}")
-    elif provider == "gemini":
-        return create_llm_client(f"gemini/{Config.GEMINI_MODEL}")
-    elif provider == "ollama":
-        return create_llm_client(f"ollama/{Config.OLLAMA_MODEL}")
-    elif provider == "cohere":
-        return create_llm_client(f"cohere/{Config.COHERE_MODEL}")
-    elif provider == "huggingface":
-        return create_llm_client(f"huggingface/{Config.HUGGINGFACE_MODEL}")
-    else:
+    model_setting = _LEGACY_MODEL_SETTINGS.get(Config.LLM_PROVIDER.lower())
+    if model_setting is None:
         # Default to Groq if provider is unknown
-        return create_llm_client(Config.DEFAULT_MODEL_ID)
\ No newline at end of file
+        return create_llm_client(Config.DEFAULT_MODEL_ID)
+    return create_llm_client(f"{Config.LLM_PROVIDER.lower()}/{getattr(Config, model_setting)}")
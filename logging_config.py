@@ -0,0 +1,29 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+
+_listener = None
+
+
+def setup_logging(level: int = logging.INFO):
+    """Route log records through a queue so only a background thread writes to stdout
+
+    Safe to call more than once (uvicorn imports main twice when started via main()).
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    # Flush anything still queued on interpreter exit
+    atexit.register(_listener.stop)
@@ -1,18 +1,24 @@
 import asyncio
-import json
+import importlib.util
+import logging
+import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 import uvicorn
 import threading
-import signal
 import sys
 
+import fast_json
 from config import Config
+from logging_config import setup_logging
 from audio_handler import AudioHandler
-from websocket_manager import manager
-from web_ui import get_html_content
+from websocket_manager import decode_client_message, manager
+from llm_client import aclose_llm_clients, aclose_shared_http_client
+from static_assets import STATIC_DIR, CachedStaticFiles, write_static_ui
+
+setup_logging()
+log = logging.getLogger(__name__)
 
 # Global audio handler
 audio_handler = None
@@ -24,8 +30,8 @@ async def lifespan(app: FastAPI):
     global audio_handler
 
     # Startup
-    print("Starting Real-Time AI Audio Assistant...")
-    print(f"Using LLM Provider: {Config.LLM_PROVIDER}")
+    log.info("Starting Real-Time AI Audio Assistant...")
+    log.info(f"Using LLM Provider: {Config.LLM_PROVIDER}")
 
     # Initialize audio handler with callback
     async def on_transcription(text: str):
@@ -33,126 +39,184 @@ async def lifespan(app: FastAPI):
         # Send transcription to all connected clients
         await broadcast_transcription(text)
 
-    def sync_on_transcription(text: str):
-        """Synchronous wrapper for the transcription callback"""
-        # Get the current event loop or create a new one
+    if Config.API_ONLY:
+        log.info("API-only mode: audio capture disabled")
+    else:
         try:
-            loop = asyncio.get_running_loop()
-            asyncio.run_coroutine_threadsafe(on_transcription(text), loop)
-        except RuntimeError:
-            # No running loop, create a new one
-            try:
-                asyncio.run(on_transcription(text))
-            except Exception as e:
-                print(f"Error in transcription callback: {e}")
+            # AudioHandler captures this running loop and schedules the coroutine onto it
+            # from its worker thread with run_coroutine_threadsafe
+            audio_handler = AudioHandler(on_transcription)
+            # Initialize with default model configuration for optimal real-time processing
+            default_model_config = Config.get_model_config(Config.DEFAULT_MODEL_ID)
+            audio_handler.update_realtime_config(default_model_config)
+            log.info("Audio handler initialized successfully with real-time optimizations")
+        except Exception as e:
+            log.error(f"Failed to initialize audio handler: {e}")
+            log.warning("Audio features will be disabled")
 
-    try:
-        audio_handler = AudioHandler(sync_on_transcription)
-        # Initialize with default model configuration for optimal real-time processing
-        default_model_config = Config.get_model_config(Config.DEFAULT_MODEL_ID)
-        audio_handler.update_realtime_config(default_model_config)
-        print("Audio handler initialized successfully with real-time optimizations")
-    except Exception as e:
-        print(f"Failed to initialize audio handler: {e}")
-        print("Audio features will be disabled")
+    status_refresher = asyncio.create_task(_refresh_status())
 
     yield
 
     # Shutdown
+    status_refresher.cancel()
     if audio_handler:
-        audio_handler.stop_listening()
-    print("Application shutdown complete")
+        await asyncio.to_thread(audio_handler.close)
+    await aclose_llm_clients()
+    await aclose_shared_http_client()
+    log.info("Application shutdown complete")
 
 
+# ORJSONResponse needs orjson installed; fall back to the stdlib encoder otherwise
+DefaultJSONResponse = ORJSONResponse if fast_json.ORJSON_AVAILABLE else JSONResponse
+
 # Initialize FastAPI app with lifespan
-app = FastAPI(title=Config.UI_TITLE, lifespan=lifespan)
+app = FastAPI(title=Config.UI_TITLE, lifespan=lifespan, default_response_class=DefaultJSONResponse)
 
 
 async def broadcast_transcription(text: str):
     """Broadcast transcription to all connected WebSocket clients"""
-    for connection in manager.active_connections:
-        try:
-            await manager.handle_transcription(connection, text)
-        except Exception as e:
-            print(f"Error broadcasting transcription: {e}")
+    if not manager.active_connections:
+        return  # Nobody listening; skip serialization entirely
+    # The snapshot is the fan-out target: a client disconnecting mid-broadcast just fails
+    # its own response (collected by return_exceptions) instead of shifting the list
+    connections = tuple(manager.active_connections)
+    # The transcription is identical for everyone: serialize it once
+    await manager.broadcast(manager.transcription_message(text))
+    # Handle every client concurrently so one slow connection doesn't delay the rest
+    results = await asyncio.gather(
+        *(manager.respond_to_transcription(connection, text) for connection in connections),
+        return_exceptions=True
+    )
+    for connection, result in zip(connections, results):
+        if isinstance(result, Exception):
+            log.error("Error broadcasting transcription: %s", result, exc_info=result)
+            manager.disconnect(connection)
+
+
+write_static_ui()
 
 
-@app.get("/", response_class=HTMLResponse)
-async def get_ui():
-    """Serve the main UI"""
-    return HTMLResponse(content=get_html_content())
+async def _dispatch_messages(websocket: WebSocket, inbox: asyncio.Queue):
+    """Handle a connection's messages in order, taking every queued one per wake-up"""
+    while True:
+        batch = [await inbox.get()]
+        while not inbox.empty():
+            batch.append(inbox.get_nowait())
+        for message in batch:
+            try:
+                await manager.handle_message(websocket, message)
+            except Exception as e:
+                log.error(f"Error handling message: {e}")
 
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time communication"""
     await manager.connect(websocket)
+    # Reading is decoupled from handling, so a burst of frames is decoded back to back
+    # while a long-running handler (e.g. a streamed LLM reply) is still busy. The inbox
+    # is bounded: once it fills, reading pauses until the handler catches up
+    inbox = asyncio.Queue(maxsize=Config.WS_RECEIVE_QUEUE_SIZE)
+    dispatcher = asyncio.create_task(_dispatch_messages(websocket, inbox))
     try:
         while True:
-            # Receive message from client
-            data = await websocket.receive_text()
-            message = json.loads(data)
-
-            # Handle the message
-            await manager.handle_message(websocket, message)
+            # Receive message from client; binary frames are parsed without a str round trip
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            data = frame.get("bytes")
+            await inbox.put(decode_client_message(data if data is not None else frame["text"]))
 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        log.error(f"WebSocket error: {e}")
         manager.disconnect(websocket)
+    finally:
+        dispatcher.cancel()
 
 
-@app.get("/start-audio")
+@app.post("/start-audio")
 async def start_audio():
     """Start audio listening"""
     global audio_handler
     if audio_handler:
-        audio_handler.start_listening()
+        # Opening the device and starting threads blocks; keep it off the event loop
+        await asyncio.to_thread(audio_handler.start_listening)
         return {"status": "started", "message": "Audio listening started"}
     return {"status": "error", "message": "Audio handler not available"}
 
 
-@app.get("/stop-audio")
+@app.post("/stop-audio")
 async def stop_audio():
     """Stop audio listening"""
     global audio_handler
     if audio_handler:
-        audio_handler.stop_listening()
+        await asyncio.to_thread(audio_handler.stop_listening)
         return {"status": "stopped", "message": "Audio listening stopped"}
     return {"status": "error", "message": "Audio handler not available"}
 
 
-@app.get("/status")
-async def get_status():
-    """Get application status"""
-    return {
+def _status_snapshot() -> bytes:
+    """Serialize the current application status"""
+    return fast_json.dumps({
         "status": "running",
         "llm_provider": Config.LLM_PROVIDER,
         "active_connections": len(manager.active_connections),
         "audio_available": audio_handler is not None,
         "audio_listening": audio_handler.is_listening if audio_handler else False
-    }
+    })
 
 
-def signal_handler(sig, frame):
-    """Handle shutdown signals"""
-    print("\nShutting down gracefully...")
-    global audio_handler
-    if audio_handler:
-        audio_handler.stop_listening()
-    sys.exit(0)
+# Refreshed on a tick so polling /status costs nothing regardless of poll rate
+_status_body = _status_snapshot()
+
+
+async def _refresh_status(interval: float = 1.0):
+    """Keep the cached /status body current"""
+    global _status_body
+    while True:
+        _status_body = _status_snapshot()
+        await asyncio.sleep(interval)
+
+
+@app.get("/status")
+async def get_status():
+    """Get application status (at most about a second old)"""
+    return Response(content=_status_body, media_type="application/json")
+
+
+# Registered last: the mount matches every path, so the routes above must take precedence
+app.mount("/", CachedStaticFiles(directory=STATIC_DIR, html=True), name="static")
+
+
+def _server_impl(setting: str, fast: str, module: str, fallback: str) -> str:
+    """Resolve an "auto" uvicorn implementation to the C-accelerated one when it is installed"""
+    if setting != "auto":
+        return setting
+    return fast if importlib.util.find_spec(module) else fallback
 
 
 def main():
     """Main entry point"""
-    # Register signal handlers for graceful shutdown
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    # No signal handlers of our own: uvicorn handles SIGINT/SIGTERM by finishing in-flight
+    # work and running the lifespan shutdown, which stops audio capture off the loop
+
+    if "--api-only" in sys.argv[1:]:
+        # Via the environment so every worker process sees it when it re-imports Config
+        os.environ["API_ONLY"] = "true"
+        Config.API_ONLY = True
+
+    workers = Config.WORKERS
+    if workers > 1 and not Config.API_ONLY:
+        # Audio capture and the connection manager are per-process state
+        log.warning("⚠️ WORKERS > 1 needs --api-only (audio and broadcasts can't span workers); using 1 worker")
+        workers = 1
 
-    print(f"Starting server on {Config.HOST}:{Config.PORT}")
-    print("Make sure to set your API keys in the .env file!")
-    print("Press Ctrl+C to stop the server")
+    log.info(f"Starting server on {Config.HOST}:{Config.PORT}")
+    log.info("Make sure to set your API keys in the .env file!")
+    log.info("Press Ctrl+C to stop the server")
 
     # Start the server
     uvicorn.run(
@@ -160,7 +224,13 @@ def main():
         host=Config.HOST,
         port=Config.PORT,
         reload=False,  # Disable reload in production
-        log_level="info"
+        log_level="info",
+        workers=workers,
+        # Prefer uvloop / httptools / websockets; the UVICORN_* settings override
+        loop=_server_impl(Config.UVICORN_LOOP, "uvloop", "uvloop", "asyncio"),
+        http=_server_impl(Config.UVICORN_HTTP, "httptools", "httptools", "h11"),
+        ws=_server_impl(Config.UVICORN_WS, "websockets", "websockets", "auto"),
+        ws_per_message_deflate=Config.WS_PER_MESSAGE_DEFLATE
     )
 
 
@@ -46,6 +46,14 @@ def run_application():
         python_path = os.path.join('.venv', 'bin', 'python')
     
     try:
+        if os.name != 'nt':
+            # Replace this process with the app instead of keeping a second interpreter around;
+            # signals such as Ctrl+C then go straight to the server. execv doesn't flush
+            # Python's buffers, so push the banner out first (stdout is block-buffered when piped)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.execv(python_path, [python_path, 'main.py'])
+        # Windows' execv doesn't replace the process (the console would return early)
         subprocess.run([python_path, 'main.py'], check=True)
     except KeyboardInterrupt:
         print("\n👋 Application stopped by user")
@@ -0,0 +1,153 @@
+import contextlib
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import textwrap
+from typing import Optional
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from web_ui import APP_CSS, CDN_SCRIPTS, SERVICE_WORKER_JS, get_html_content
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+
+# Written by install.sh: markdown-it, DOMPurify and @msgpack/msgpack concatenated into one file
+VENDOR_BUNDLE = os.path.join(BASE_DIR, "vendor", "ui-libs.js")
+
+# Files under static/assets/ carry a content hash in their name and never change
+ASSETS_DIR = "assets"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Everything else (the page itself) is revalidated against its ETag on each load
+REVALIDATE_CACHE_CONTROL = "no-cache, must-revalidate"
+
+# Precompressed siblings written next to each generated file, in order of preference
+PRECOMPRESSED_VARIANTS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _write_if_changed(path: str, data: bytes):
+    """Atomically write data to path unless the file already holds exactly that content"""
+    # Leave an up-to-date file alone so its mtime/ETag (and browser caches) stay valid
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return
+    except FileNotFoundError:
+        pass
+    # Write-then-rename: concurrent workers never serve a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_with_variants(path: str, data: bytes):
+    """Write a file along with its .gz (and, with brotli installed, .br) precompressed siblings"""
+    _write_if_changed(path, data)
+    # mtime=0 keeps the gzip output identical across restarts, so unchanged files aren't rewritten
+    _write_if_changed(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_if_changed(path + ".br", brotli.compress(data, quality=11))
+    else:
+        # A .br left over from an install that had brotli would shadow the fresh file
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path + ".br")
+
+
+def _accepted_encodings(scope) -> set:
+    """Content codings the client accepts, from its Accept-Encoding header"""
+    accepted = set()
+    for item in Headers(scope=scope).get("accept-encoding", "").split(","):
+        coding, _, params = item.partition(";")
+        weight = params.strip()
+        if weight.startswith("q="):
+            try:
+                if float(weight[2:]) == 0:
+                    continue  # q=0 means "not acceptable"
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _publish_asset(stem: str, extension: str, data: bytes) -> str:
+    """Write data to static/assets/ under a content-hashed name and return its URL"""
+    name = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+    os.makedirs(os.path.join(STATIC_DIR, ASSETS_DIR), exist_ok=True)
+    _write_with_variants(os.path.join(STATIC_DIR, ASSETS_DIR, name), data)
+    return f"/{ASSETS_DIR}/{name}"
+
+
+def _publish_vendor_bundle() -> Optional[str]:
+    """Publish the vendored script bundle, if install.sh fetched one, and return its URL"""
+    try:
+        with open(VENDOR_BUNDLE, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return _publish_asset("ui-libs", ".js", data)
+
+
+def write_static_ui():
+    """Render the UI page and its assets into static/ for StaticFiles to serve"""
+    os.makedirs(STATIC_DIR, exist_ok=True)
+    bundle_url = _publish_vendor_bundle()
+    # Same-origin bundle when install.sh fetched one, the CDN otherwise
+    library_scripts = f'    <script defer src="{bundle_url}"></script>' if bundle_url else CDN_SCRIPTS
+    stylesheet_url = _publish_asset("app", ".css", textwrap.dedent(APP_CSS).encode("utf-8"))
+    html = get_html_content(library_scripts, stylesheet_url).encode("utf-8")
+    _write_with_variants(os.path.join(STATIC_DIR, "index.html"), html)
+
+    precache_urls = ["/", stylesheet_url] + ([bundle_url] if bundle_url else [])
+    _write_with_variants(os.path.join(STATIC_DIR, "sw.js"), _service_worker(precache_urls))
+
+
+def _service_worker(precache_urls: list) -> bytes:
+    """The service worker script for this build, keyed to the current asset names"""
+    # A new cache name per build makes browsers install the new worker and drop the old cache
+    cache_name = "audio-assist-" + hashlib.sha256("\n".join(precache_urls).encode("utf-8")).hexdigest()[:12]
+    header = (f"const CACHE_NAME = {json.dumps(cache_name)};\n"
+              f"const PRECACHE_URLS = {json.dumps(precache_urls)};\n")
+    return (header + SERVICE_WORKER_JS).encode("utf-8")
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that serves precompressed siblings and sets caching headers"""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        accepted = _accepted_encodings(scope)
+        response = None
+        for encoding, suffix in PRECOMPRESSED_VARIANTS:
+            if encoding not in accepted:
+                continue
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except FileNotFoundError:
+                continue
+            response = super().file_response(full_path + suffix, variant_stat, scope, status_code)
+            if response.status_code != 304:
+                media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+                if media_type.startswith("text/"):
+                    media_type += "; charset=utf-8"
+                response.headers["Content-Type"] = media_type
+                response.headers["Content-Encoding"] = encoding
+            break
+        if response is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+
+        # Tell shared caches to keep the encoded variants apart
+        response.headers["Vary"] = "Accept-Encoding"
+        if os.path.basename(os.path.dirname(full_path)) == ASSETS_DIR:
+            # Hashed names change with their content, so a cached copy is never stale
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+        return response
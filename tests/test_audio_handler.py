@@ -0,0 +1,25 @@
+import numpy as np
+
+from audio_handler import _trailing_silent_frames
+
+
+def _scratch(n_samples: int, frame_size: int):
+    """Scratch buffers with the dtypes RealtimeAudioHandler allocates"""
+    n_frames = n_samples // frame_size
+    return (np.empty(n_samples, dtype=np.int32), np.empty(n_frames, dtype=np.float64),
+            np.empty(n_frames, dtype=bool))
+
+
+def test_full_scale_negative_frame_is_voiced():
+    """abs(-32768) must count as 32768, not wrap back to -32768 and read as silence"""
+    frame_size = 4
+    samples = np.concatenate([np.zeros(frame_size, dtype=np.int16),
+                              np.full(frame_size, -32768, dtype=np.int16)])
+    assert _trailing_silent_frames(samples, 32767.5, frame_size, *_scratch(samples.shape[0], frame_size)) == 0
+
+
+def test_trailing_silence_is_counted():
+    frame_size = 4
+    samples = np.concatenate([np.full(frame_size, -32768, dtype=np.int16),
+                              np.zeros(2 * frame_size, dtype=np.int16)])
+    assert _trailing_silent_frames(samples, 100.0, frame_size, *_scratch(samples.shape[0], frame_size)) == 2
@@ -0,0 +1,79 @@
+import asyncio
+
+from llm_client import ConversationWindow, _iter_lines
+
+
+def _window(n_messages: int, max_messages: int = 100) -> ConversationWindow:
+    window = ConversationWindow(max_messages=max_messages)
+    for i in range(n_messages):
+        window.append({"role": "user", "content": str(i)})
+    return window
+
+
+def _contents(messages: list) -> list:
+    return [int(m["content"]) for m in messages]
+
+
+def test_view_keeps_its_prefix_until_twice_keep():
+    window = _window(0)
+    keep = 3
+    for i in range(2 * keep):
+        window.append({"role": "user", "content": str(i)})
+        assert _contents(window.view(keep)) == list(range(i + 1))
+    # One past 2 * keep: the window jumps to the most recent `keep` messages
+    window.append({"role": "user", "content": str(2 * keep)})
+    assert _contents(window.view(keep)) == [4, 5, 6]
+    # ...and that new prefix is then stable again
+    window.append({"role": "user", "content": "7"})
+    assert _contents(window.view(keep)) == [4, 5, 6, 7]
+
+
+def test_window_sizes_are_independent():
+    window = _window(9)
+    assert _contents(window.view(4)) == [5, 6, 7, 8]
+    # The small window's jump must not drop messages the larger one still shows
+    assert _contents(window.view(10)) == list(range(9))
+    assert len(window) == 9
+    window.append({"role": "user", "content": "9"})
+    assert _contents(window.view(4)) == [5, 6, 7, 8, 9]
+    assert _contents(window.view(10)) == list(range(10))
+
+
+def test_views_stay_correct_past_max_messages():
+    window = _window(6, max_messages=8)
+    assert _contents(window.view(3)) == [0, 1, 2, 3, 4, 5]
+    for i in range(6, 12):
+        window.append({"role": "user", "content": str(i)})
+    # The cap keeps the newest 8; the window start is translated past the dropped ones
+    assert len(window) == 8
+    assert _contents(window.view(3)) == [9, 10, 11]
+    assert _contents(window.view(100)) == list(range(4, 12))
+
+
+class _Content:
+    """Stand-in for aiohttp's StreamReader that yields fixed chunks"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    async def iter_chunked(self, chunk_size):
+        for chunk in self._chunks:
+            yield chunk
+
+
+def _lines(chunks) -> list:
+    async def collect():
+        return [line async for line in _iter_lines(_Content(chunks))]
+    return asyncio.run(collect())
+
+
+def test_iter_lines_matches_split():
+    chunks = [b"ab\ncd", b"e\n\nf", b"", b"g\n", b"\n", b"tail"]
+    assert _lines(chunks) == b"".join(chunks).split(b"\n")
+    assert all(type(line) is bytes for line in _lines(chunks))
+
+
+def test_iter_lines_trailing_newline():
+    # split() yields a final empty item after a trailing newline; a stream has no line there
+    body = b"one\ntwo\n\n"
+    assert _lines([body[:5], body[5:]]) == body.split(b"\n")[:-1]
@@ -0,0 +1,26 @@
+import json
+
+import msgpack
+
+from websocket_manager import _encode_json, _encode_msgpack, _join_json, _join_msgpack
+
+MESSAGES = [
+    {"type": "status", "content": "thinking", "message": "AI is thinking..."},
+    {"type": "response_chunk", "content": "Héllo ✓"},
+    {"type": "response_complete", "content": ""},
+]
+
+
+def test_json_batch_decodes_to_items():
+    frame = _join_json([_encode_json(m) for m in MESSAGES])
+    assert json.loads(frame) == {"type": "batch", "items": MESSAGES}
+
+
+def test_msgpack_batch_decodes_to_items():
+    frame = _join_msgpack([_encode_msgpack(m) for m in MESSAGES])
+    assert msgpack.unpackb(frame) == {"type": "batch", "items": MESSAGES}
+
+
+def test_msgpack_batch_of_one():
+    frame = _join_msgpack([_encode_msgpack(MESSAGES[0])])
+    assert msgpack.unpackb(frame) == {"type": "batch", "items": MESSAGES[:1]}
@@ -1,17 +1,17 @@
-def get_html_content() -> str:
-    """Return the HTML content for the web UI"""
-    return """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Real-Time AI Audio Assistant</title>
-    <!-- Markdown parsing and HTML sanitization libraries -->
-    <script src="https://cdn.jsdelivr.net/npm/marked/marked.min.js"></script>
-    <script src="https://cdn.jsdelivr.net/npm/dompurify/dist/purify.min.js"></script>
-    <style>
-        * {
+import functools
+
+# Markdown parsing, HTML sanitization and MessagePack libraries, used when no local bundle is being served;
+# versions match the ones install.sh bundles, so both builds run the same code
+# (deferred, so they download alongside the page instead of blocking the parser)
+CDN_SCRIPTS = """    <link rel="preconnect" href="https://cdn.jsdelivr.net">
+    <link rel="dns-prefetch" href="https://cdn.jsdelivr.net">
+    <script defer src="https://cdn.jsdelivr.net/npm/markdown-it@14.1.0/dist/markdown-it.min.js"></script>
+    <script defer src="https://cdn.jsdelivr.net/npm/dompurify@3.1.6/dist/purify.min.js"></script>
+    <script defer src="https://cdn.jsdelivr.net/npm/@msgpack/msgpack@2.8.0/dist.es5+umd/msgpack.min.js"></script>"""
+
+
+# Base layout rules, always inlined so the page is laid out before any stylesheet arrives
+CRITICAL_CSS = """        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
@@ -52,7 +52,26 @@ def get_html_content() -> str:
             background-clip: text;
         }
         
-        .status-bar {
+        /* Interface icons come from the inline sprite instead of emoji fonts */
+        .icon {
+            width: 1em;
+            height: 1em;
+            vertical-align: -0.125em;
+            fill: none;
+            stroke: currentColor;
+            stroke-width: 2;
+            stroke-linecap: round;
+            stroke-linejoin: round;
+        }
+        
+        .header h1 .icon {
+            stroke: #667eea;
+        }
+        
+"""
+
+# Everything else; linked as a separate cacheable stylesheet when the static UI is generated
+APP_CSS = """        .status-bar {
             display: flex;
             justify-content: space-between;
             align-items: center;
@@ -74,6 +93,8 @@ def get_html_content() -> str:
             border-radius: 50%;
             background: #dc3545;
             animation: pulse 2s infinite;
+            /* Own compositor layer, so the endless pulse never repaints the status bar */
+            will-change: transform, opacity;
         }
         
         .status-dot.connected {
@@ -276,8 +297,10 @@ def get_html_content() -> str:
             margin-top: 5px;
         }
         
+        /* Hidden with visibility rather than display, so showing it doesn't shift the layout */
         .typing-indicator {
-            display: none;
+            display: flex;
+            visibility: hidden;
             align-items: center;
             gap: 10px;
             padding: 12px 16px;
@@ -288,7 +311,7 @@ def get_html_content() -> str:
         }
         
         .typing-indicator.active {
-            display: flex;
+            visibility: visible;
         }
         
         .typing-dots {
@@ -302,6 +325,20 @@ def get_html_content() -> str:
             border-radius: 50%;
             background: #667eea;
             animation: typing 1.4s infinite ease-in-out;
+            will-change: transform;
+        }
+        
+        /* No animating dots nobody can see */
+        .typing-indicator:not(.active) .typing-dots span,
+        .page-hidden .status-dot,
+        .page-hidden .typing-dots span {
+            animation-play-state: paused;
+        }
+        
+        @media (prefers-reduced-motion: reduce) {
+            .status-dot, .typing-dots span, .message {
+                animation: none;
+            }
         }
         
         .typing-dots span:nth-child(1) { animation-delay: -0.32s; }
@@ -486,12 +523,113 @@ def get_html_content() -> str:
                 max-width: 90%;
             }
         }
-    </style>
+"""
+
+
+# Served as /sw.js; static_assets prepends CACHE_NAME and PRECACHE_URLS for the current build
+SERVICE_WORKER_JS = """
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE_NAME)
+            .then(cache => cache.addAll(PRECACHE_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    // Drop the caches of earlier builds
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(names.filter(name => name !== CACHE_NAME).map(name => caches.delete(name))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) {
+        return;
+    }
+
+    if (url.pathname.startsWith('/assets/')) {
+        // Cache first: hashed names never change content
+        event.respondWith(
+            caches.match(request).then(cached => cached || fetch(request).then(response => {
+                if (response.ok) {
+                    const copy = response.clone();
+                    caches.open(CACHE_NAME).then(cache => cache.put(request, copy));
+                }
+                return response;
+            }))
+        );
+    } else if (request.mode === 'navigate' && url.pathname === '/') {
+        // Stale-while-revalidate: show the cached page at once, refresh it in the background
+        event.respondWith(caches.open(CACHE_NAME).then(cache => cache.match('/').then(cached => {
+            const network = fetch(request).then(response => {
+                if (response.ok) {
+                    cache.put('/', response.clone());
+                }
+                return response;
+            });
+            if (cached) {
+                event.waitUntil(network.catch(() => undefined));
+                return cached;
+            }
+            return network;
+        })));
+    }
+});
+"""
+
+@functools.lru_cache(maxsize=8)
+def get_html_content(library_scripts: str = CDN_SCRIPTS, stylesheet_url: str = None) -> str:
+    """Return the HTML content for the web UI, loading the libraries with the given script tags"""
+    if stylesheet_url is None:
+        styles = "    <style>\n" + CRITICAL_CSS + APP_CSS + "    </style>"
+    else:
+        styles = ("    <style>\n" + CRITICAL_CSS + "    </style>\n"
+                  f'    <link rel="stylesheet" href="{stylesheet_url}">')
+    return """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Real-Time AI Audio Assistant</title>
+    <!-- Markdown parsing, HTML sanitization and MessagePack libraries -->
+""" + library_scripts + """
+""" + styles + """
 </head>
 <body>
+    <svg width="0" height="0" style="position: absolute" aria-hidden="true">
+        <symbol id="icon-mic" viewBox="0 0 24 24">
+            <path d="M12 1a3 3 0 0 0-3 3v8a3 3 0 0 0 6 0V4a3 3 0 0 0-3-3z"/>
+            <path d="M19 10v2a7 7 0 0 1-14 0v-2"/>
+            <path d="M12 19v4M8 23h8"/>
+        </symbol>
+        <symbol id="icon-globe" viewBox="0 0 24 24">
+            <circle cx="12" cy="12" r="10"/>
+            <path d="M2 12h20"/>
+            <path d="M12 2a15.3 15.3 0 0 1 4 10 15.3 15.3 0 0 1-4 10 15.3 15.3 0 0 1-4-10 15.3 15.3 0 0 1 4-10z"/>
+        </symbol>
+        <symbol id="icon-robot" viewBox="0 0 24 24">
+            <rect x="4" y="8" width="16" height="12" rx="2"/>
+            <path d="M12 8V5"/>
+            <circle cx="12" cy="4" r="1"/>
+            <path d="M9 13v2M15 13v2"/>
+        </symbol>
+        <symbol id="icon-stop" viewBox="0 0 24 24">
+            <rect x="6" y="6" width="12" height="12" rx="1"/>
+        </symbol>
+        <symbol id="icon-trash" viewBox="0 0 24 24">
+            <path d="M3 6h18"/>
+            <path d="M19 6v14a2 2 0 0 1-2 2H7a2 2 0 0 1-2-2V6m3 0V4a2 2 0 0 1 2-2h4a2 2 0 0 1 2 2v2"/>
+        </symbol>
+    </svg>
     <div class="container">
         <div class="header">
-            <h1>🎤 AI Audio Assistant</h1>
+            <h1><svg class="icon" aria-hidden="true"><use href="#icon-mic"/></svg> AI Audio Assistant</h1>
             <p>Speak naturally and get real-time AI responses</p>
         </div>
         
@@ -508,7 +646,7 @@ def get_html_content() -> str:
         
         <div class="controls-container">
             <div class="language-selector">
-                <label for="languageSelect">🌐 Language:</label>
+                <label for="languageSelect"><svg class="icon" aria-hidden="true"><use href="#icon-globe"/></svg> Language:</label>
                 <select id="languageSelect" class="language-dropdown">
                     <option value="en-US">English (Global)</option>
                     <option value="en-US-accent">English (Spanish Accent)</option>
@@ -517,7 +655,7 @@ def get_html_content() -> str:
             </div>
             
             <div class="model-selector">
-                <label for="modelSelect">🤖 AI Model:</label>
+                <label for="modelSelect"><svg class="icon" aria-hidden="true"><use href="#icon-robot"/></svg> AI Model:</label>
                 <select id="modelSelect" class="model-dropdown">
                     <!-- Options will be populated dynamically via WebSocket -->
                     <option value="">Loading models...</option>
@@ -526,14 +664,14 @@ def get_html_content() -> str:
         </div>
         
         <div class="controls">
-            <button class="btn btn-primary" id="startBtn" onclick="startListening()">
-                🎤 Start Listening
+            <button class="btn btn-primary" id="startBtn" data-action="start-listening">
+                <svg class="icon" aria-hidden="true"><use href="#icon-mic"/></svg> Start Listening
             </button>
-            <button class="btn btn-danger" id="stopBtn" onclick="stopListening()" disabled>
-                ⏹️ Stop Listening
+            <button class="btn btn-danger" id="stopBtn" data-action="stop-listening" disabled>
+                <svg class="icon" aria-hidden="true"><use href="#icon-stop"/></svg> Stop Listening
             </button>
-            <button class="btn btn-secondary" onclick="clearChat()">
-                🗑️ Clear Chat
+            <button class="btn btn-secondary" data-action="clear-chat">
+                <svg class="icon" aria-hidden="true"><use href="#icon-trash"/></svg> Clear Chat
             </button>
         </div>
         
@@ -545,7 +683,7 @@ def get_html_content() -> str:
         </div>
         
         <div class="typing-indicator" id="typingIndicator">
-            <div>🤖 AI is thinking</div>
+            <div><svg class="icon" aria-hidden="true"><use href="#icon-robot"/></svg> AI is thinking</div>
             <div class="typing-dots">
                 <span></span>
                 <span></span>
@@ -554,8 +692,8 @@ def get_html_content() -> str:
         </div>
         
         <div class="input-area">
-            <input type="text" class="text-input" id="textInput" placeholder="Type a message or use voice input..." onkeypress="handleKeyPress(event)">
-            <button class="send-btn" onclick="sendTextMessage()">Send</button>
+            <input type="text" class="text-input" id="textInput" placeholder="Type a message or use voice input...">
+            <button class="send-btn" data-action="send">Send</button>
         </div>
         
         <div class="footer">
@@ -564,24 +702,69 @@ def get_html_content() -> str:
     </div>
 
     <script>
+        // Every element the script touches, looked up once (the script runs after the markup is parsed)
+        const els = Object.freeze({
+            connectionStatus: document.getElementById('connectionStatus'),
+            connectionText: document.getElementById('connectionText'),
+            listeningStatus: document.getElementById('listeningStatus'),
+            listeningText: document.getElementById('listeningText'),
+            startBtn: document.getElementById('startBtn'),
+            stopBtn: document.getElementById('stopBtn'),
+            chatContainer: document.getElementById('chatContainer'),
+            typingIndicator: document.getElementById('typingIndicator'),
+            textInput: document.getElementById('textInput'),
+            languageSelect: document.getElementById('languageSelect'),
+            modelSelect: document.getElementById('modelSelect'),
+            welcomeTime: document.getElementById('welcomeTime'),
+            controls: document.querySelector('.controls'),
+            inputArea: document.querySelector('.input-area')
+        });
+        
+        // One formatter for every timestamp; same fields as toLocaleTimeString() shows by default
+        const TIME_FMT = new Intl.DateTimeFormat(undefined, {hour: 'numeric', minute: '2-digit', second: '2-digit'});
+        
         let socket = null;
         let isListening = false;
         let currentResponse = '';
         
-        // Configure marked.js for GitHub Flavored Markdown
-        marked.setOptions({
-            gfm: true,        // Use GitHub Flavored Markdown
-            breaks: true,     // Convert single newlines into <br>
-            mangle: false,    // To avoid obfuscating email addresses
-            headerIds: false  // To avoid creating ids for headers
-        });
+        // Configured once on DOMContentLoaded (the libraries are deferred, so they run after this
+        // script); rules the assistant's answers never need are disabled so each render runs fewer regexes
+        let md = null;
+        
+        function initMarkdown() {
+            md = window.markdownit({
+                html: false,      // Raw HTML in responses is escaped, not rendered
+                linkify: false,   // Don't scan plain text for URLs
+                breaks: true      // Convert single newlines into <br>
+            }).disable(['html_inline', 'html_block', 'reference', 'autolink']);
+            
+            // Installed once so sanitize() doesn't re-parse and merge the config on every render
+            DOMPurify.setConfig(PURIFY_CONFIG);
+        }
+        
+        // markdown-it already escapes raw HTML, so the sanitizer only has to allow what it emits
+        const PURIFY_CONFIG = {
+            ALLOWED_TAGS: ['p', 'br', 'strong', 'em', 's', 'code', 'pre', 'ul', 'ol', 'li',
+                           'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'hr',
+                           'table', 'thead', 'tbody', 'tr', 'th', 'td', 'a'],
+            ALLOWED_ATTR: ['href', 'title', 'class', 'start'],  // start keeps ordered list numbering
+            ALLOW_DATA_ATTR: false,
+            RETURN_TRUSTED_TYPE: false
+        };
         
         // Initialize WebSocket connection
+        let reconnectTimer = null;
+        
         function initWebSocket() {
+            clearTimeout(reconnectTimer);
+            reconnectTimer = null;
+            
             const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
             const wsUrl = `${protocol}//${window.location.host}/ws`;
             
-            socket = new WebSocket(wsUrl);
+            // Binary MessagePack frames when the decoder loaded; the server sends JSON text otherwise
+            socket = new WebSocket(wsUrl, window.MessagePack ? ['msgpack'] : []);
+            socket.binaryType = 'arraybuffer';
             
             socket.onopen = function(event) {
                 console.log('WebSocket connected');
@@ -594,8 +777,10 @@ def get_html_content() -> str:
             };
             
             socket.onmessage = function(event) {
-                const data = JSON.parse(event.data);
-                handleWebSocketMessage(data);
+                messageQueue.push(event.data);
+                if (messageQueue.length === 1) {
+                    requestAnimationFrame(drainMessages);
+                }
             };
             
             socket.onclose = function(event) {
@@ -603,8 +788,14 @@ def get_html_content() -> str:
                 updateConnectionStatus(false);
                 addMessage('system', '❌ Disconnected from AI Assistant', new Date());
                 
-                // Attempt to reconnect after 3 seconds
-                setTimeout(initWebSocket, 3000);
+                // Attempt to reconnect after 3 seconds; a hidden tab waits until it is shown
+                // again (see the visibilitychange handler) instead of retrying in the background
+                reconnectTimer = setTimeout(function() {
+                    reconnectTimer = null;
+                    if (!document.hidden) {
+                        initWebSocket();
+                    }
+                }, 3000);
             };
             
             socket.onerror = function(event) {
@@ -613,10 +804,26 @@ def get_html_content() -> str:
             };
         }
         
+        // Frames are parsed and handled in one batch per animation frame
+        const messageQueue = [];
+        
+        function drainMessages() {
+            // Response chunks only append to the streamed text, so a run of them still renders once
+            for (const raw of messageQueue.splice(0)) {
+                const data = typeof raw === 'string' ? JSON.parse(raw) : MessagePack.decode(new Uint8Array(raw));
+                handleWebSocketMessage(data);
+            }
+        }
+        
         function handleWebSocketMessage(data) {
             switch(data.type) {
+                case 'batch':
+                    // Messages that queued up on the server while this client lagged
+                    data.items.forEach(handleWebSocketMessage);
+                    break;
+                
                 case 'transcription':
-                    addMessage('transcription', `🎙️ ${data.content}`, new Date(data.timestamp * 1000));
+                    addMessage('transcription', `🎙️ ${data.content}`, new Date());
                     break;
                 
                 case 'status':
@@ -627,12 +834,12 @@ def get_html_content() -> str:
                 
                 case 'response_chunk':
                     hideTypingIndicator();
-                    updateStreamingResponse(data.content, data.full_content);
+                    updateStreamingResponse(data.content);
                     break;
                 
                 case 'response_complete':
                     hideTypingIndicator();
-                    finalizeResponse(data.content, new Date(data.timestamp * 1000));
+                    finalizeResponse(data.content, new Date());
                     break;
                 
                 case 'listening_started':
@@ -658,22 +865,22 @@ def get_html_content() -> str:
                 
                 case 'model_changed':
                     if (data.status === 'success') {
-                        addMessage('system', `🤖 Model changed to: ${data.new_model_display_name}`, new Date(data.timestamp * 1000));
+                        addMessage('system', `🤖 Model changed to: ${data.new_model_display_name}`, new Date());
                         enableModelDropdown();
                     }
                     break;
                 
                 case 'error':
                     hideTypingIndicator();
-                    addMessage('system', `❌ Error: ${data.content}`, new Date(data.timestamp * 1000));
+                    addMessage('system', `❌ Error: ${data.content}`, new Date());
                     enableModelDropdown();
                     break;
             }
         }
         
         function updateConnectionStatus(connected) {
-            const statusDot = document.getElementById('connectionStatus');
-            const statusText = document.getElementById('connectionText');
+            const statusDot = els.connectionStatus;
+            const statusText = els.connectionText;
             
             if (connected) {
                 statusDot.classList.add('connected');
@@ -685,10 +892,10 @@ def get_html_content() -> str:
         }
         
         function updateListeningStatus(listening) {
-            const statusDot = document.getElementById('listeningStatus');
-            const statusText = document.getElementById('listeningText');
-            const startBtn = document.getElementById('startBtn');
-            const stopBtn = document.getElementById('stopBtn');
+            const statusDot = els.listeningStatus;
+            const statusText = els.listeningText;
+            const startBtn = els.startBtn;
+            const stopBtn = els.stopBtn;
             
             isListening = listening;
             
@@ -708,24 +915,26 @@ def get_html_content() -> str:
         function startListening() {
             if (socket && socket.readyState === WebSocket.OPEN) {
                 socket.send(JSON.stringify({type: 'start_listening'}));
-                
-                // Also call the HTTP endpoint to start audio capture
-                fetch('/start-audio')
-                    .then(response => response.json())
-                    .then(data => console.log('Audio started:', data))
-                    .catch(error => console.error('Error starting audio:', error));
             }
         }
         
         function stopListening() {
             if (socket && socket.readyState === WebSocket.OPEN) {
                 socket.send(JSON.stringify({type: 'stop_listening'}));
-                
-                // Also call the HTTP endpoint to stop audio capture
-                fetch('/stop-audio')
-                    .then(response => response.json())
-                    .then(data => console.log('Audio stopped:', data))
-                    .catch(error => console.error('Error stopping audio:', error));
+            }
+        }
+        
+        const ACTIONS = {
+            'start-listening': startListening,
+            'stop-listening': stopListening,
+            'clear-chat': clearChat,
+            'send': sendTextMessage
+        };
+        
+        function handleAction(event) {
+            const target = event.target.closest('[data-action]');
+            if (target && !target.disabled) {
+                ACTIONS[target.dataset.action]();
             }
         }
         
@@ -737,16 +946,23 @@ def get_html_content() -> str:
         }
         
         function clearChatContainer() {
-            const chatContainer = document.getElementById('chatContainer');
-            chatContainer.innerHTML = '';
+            pendingMessages.length = 0;
+            messages.length = 0;
+            windowStart = 0;
+            windowEnd = 0;
+            stickToBottom = true;
+            topSpacer.style.height = '0px';
+            bottomSpacer.style.height = '0px';
+            chatContainer.replaceChildren(topSpacer, bottomSpacer);
         }
         
         function sendTextMessage() {
-            const textInput = document.getElementById('textInput');
+            const textInput = els.textInput;
             const message = textInput.value.trim();
             
             if (message && socket && socket.readyState === WebSocket.OPEN) {
-                // Add user message to chat
+                // Add user message to chat, bringing the conversation back into view
+                stickToBottom = true;
                 addMessage('user', message, new Date());
                 
                 // Send to server
@@ -761,75 +977,304 @@ def get_html_content() -> str:
         }
         
         function handleKeyPress(event) {
-            if (event.key === 'Enter') {
+            // Not while an IME is still composing the text
+            if (event.key === 'Enter' && !event.isComposing) {
                 sendTextMessage();
             }
         }
         
+        // Only messages near the viewport are attached to the DOM; the rest are stood in for
+        // by two spacers, so layout and paint cost don't grow with the length of the chat
+        const chatContainer = els.chatContainer;
+        const messages = [];            // {element, height} for every message, oldest first
+        const OVERSCAN = 20;            // messages kept attached beyond each edge of the viewport
+        const ESTIMATED_HEIGHT = 80;    // used until a message has been laid out once
+        let windowStart = 0;
+        let windowEnd = 0;
+        let messageGap = null;
+        
+        const topSpacer = document.createElement('div');
+        const bottomSpacer = document.createElement('div');
+        
+        // Adopt the messages already in the page (the welcome message)
+        for (const element of Array.from(chatContainer.children)) {
+            messages.push({element: element, height: ESTIMATED_HEIGHT});
+        }
+        windowEnd = messages.length;
+        chatContainer.prepend(topSpacer);
+        chatContainer.append(bottomSpacer);
+        
+        // Messages arriving within one frame are added (and scrolled to) together
+        const pendingMessages = [];
+        let rafScheduled = false;
+        let windowScheduled = false;
+        // Kept up to date by the scroll listener, so appends never have to measure to decide
+        let stickToBottom = true;
+        
+        function queueMessageElement(element) {
+            pendingMessages.push(element);
+            if (!rafScheduled) {
+                rafScheduled = true;
+                requestAnimationFrame(flushMessages);
+            }
+        }
+        
+        function flushMessages() {
+            rafScheduled = false;
+            if (pendingMessages.length === 0) {
+                return;
+            }
+            
+            for (const element of pendingMessages) {
+                messages.push({element: element, height: ESTIMATED_HEIGHT});
+            }
+            pendingMessages.length = 0;
+            
+            // New messages only scroll the chat if the user hasn't scrolled up to read history
+            renderWindow(stickToBottom);
+        }
+        
+        function measureAttached() {
+            for (let i = windowStart; i < windowEnd; i++) {
+                const element = messages[i].element;
+                if (messageGap === null) {
+                    messageGap = parseFloat(getComputedStyle(element).marginBottom) || 0;
+                }
+                messages[i].height = element.offsetHeight + messageGap;
+            }
+        }
+        
+        function sumHeights(from, to) {
+            let total = 0;
+            for (let i = from; i < to; i++) {
+                total += messages[i].height;
+            }
+            return total;
+        }
+        
+        function renderWindow(anchorBottom) {
+            measureAttached();
+            
+            const viewportHeight = chatContainer.clientHeight;
+            let first;
+            let last;
+            if (anchorBottom) {
+                last = messages.length;
+                first = last;
+                let height = 0;
+                while (first > 0 && height < viewportHeight) {
+                    first--;
+                    height += messages[first].height;
+                }
+            } else {
+                const top = chatContainer.scrollTop;
+                let offset = 0;
+                first = 0;
+                while (first < messages.length && offset + messages[first].height <= top) {
+                    offset += messages[first].height;
+                    first++;
+                }
+                last = first;
+                while (last < messages.length && offset < top + viewportHeight) {
+                    offset += messages[last].height;
+                    last++;
+                }
+            }
+            
+            setWindow(Math.max(0, first - OVERSCAN), Math.min(messages.length, last + OVERSCAN));
+            if (anchorBottom) {
+                chatContainer.scrollTop = chatContainer.scrollHeight;
+            }
+        }
+        
+        function setWindow(start, end) {
+            if (start >= windowEnd || end <= windowStart) {
+                // No overlap with what is attached: swap the whole window
+                detachRange(windowStart, windowEnd);
+                insertRange(start, end, bottomSpacer);
+            } else {
+                // Only touch the messages entering or leaving at either edge
+                detachRange(windowStart, start);
+                detachRange(end, windowEnd);
+                insertRange(start, windowStart, topSpacer.nextSibling);
+                insertRange(windowEnd, end, bottomSpacer);
+            }
+            windowStart = start;
+            windowEnd = end;
+            
+            topSpacer.style.height = sumHeights(0, start) + 'px';
+            bottomSpacer.style.height = sumHeights(end, messages.length) + 'px';
+        }
+        
+        function detachRange(from, to) {
+            for (let i = from; i < to; i++) {
+                const element = messages[i].element;
+                // Don't replay the fade-in when it scrolls back into view
+                element.style.animation = 'none';
+                element.remove();
+            }
+        }
+        
+        function insertRange(from, to, before) {
+            if (from >= to) {
+                return;
+            }
+            const fragment = document.createDocumentFragment();
+            for (let i = from; i < to; i++) {
+                fragment.appendChild(messages[i].element);
+            }
+            chatContainer.insertBefore(fragment, before);
+        }
+        
+        chatContainer.addEventListener('scroll', function() {
+            stickToBottom = (chatContainer.scrollHeight - chatContainer.scrollTop - chatContainer.clientHeight) < 8;
+            if (!windowScheduled) {
+                windowScheduled = true;
+                requestAnimationFrame(function() {
+                    windowScheduled = false;
+                    renderWindow(false);
+                });
+            }
+        }, {passive: true});
+        
         function addMessage(type, content, timestamp) {
-            const chatContainer = document.getElementById('chatContainer');
             const messageDiv = document.createElement('div');
-            messageDiv.className = `message ${type}`;
+            messageDiv.className = 'message ' + type;
             
-            const timeStr = timestamp.toLocaleTimeString();
-            messageDiv.innerHTML = `
-                <div>${content}</div>
-                <div class="timestamp">${timeStr}</div>
-            `;
+            const contentDiv = document.createElement('div');
+            contentDiv.textContent = content;
             
-            chatContainer.appendChild(messageDiv);
-            chatContainer.scrollTop = chatContainer.scrollHeight;
+            const timeDiv = document.createElement('div');
+            timeDiv.className = 'timestamp';
+            timeDiv.textContent = TIME_FMT.format(timestamp);
+            
+            messageDiv.append(contentDiv, timeDiv);
+            queueMessageElement(messageDiv);
         }
         
         let currentResponseElement = null;
+        let currentResponseContent = null;
+        let currentResponseTime = null;
+        
+        // Finished markdown blocks are rendered once into the committed node; only the
+        // block still being written is re-rendered into the tail node each frame
+        let currentCommittedNode = null;
+        let currentTailNode = null;
+        let renderedPrefixLen = 0;
+        let lastRenderedFull = null;
         
-        function updateStreamingResponse(chunk, fullContent) {
+        // Chunks arrive far faster than the display refreshes; only the latest full text is rendered each frame
+        let streamedContent = '';
+        let pendingFull = null;
+        let renderScheduled = false;
+        
+        const FENCE_PATTERN = /^ {0,3}(```|~~~)/gm;
+        
+        function renderMarkdown(text) {
+            // Parse markdown and sanitize HTML
+            return DOMPurify.sanitize(md.render(text));
+        }
+        
+        function hasOpenFence(text) {
+            const fences = text.match(FENCE_PATTERN);
+            return fences !== null && fences.length % 2 === 1;
+        }
+        
+        function updateStreamingResponse(chunk) {
             if (!currentResponseElement) {
-                const chatContainer = document.getElementById('chatContainer');
+                streamedContent = '';
                 currentResponseElement = document.createElement('div');
                 currentResponseElement.className = 'message assistant';
-                chatContainer.appendChild(currentResponseElement);
+                
+                currentResponseContent = document.createElement('div');
+                currentCommittedNode = document.createElement('div');
+                currentTailNode = document.createElement('div');
+                currentResponseContent.append(currentCommittedNode, currentTailNode);
+                renderedPrefixLen = 0;
+                
+                currentResponseTime = document.createElement('div');
+                currentResponseTime.className = 'timestamp';
+                currentResponseTime.textContent = 'Responding...';
+                currentResponseElement.append(currentResponseContent, currentResponseTime);
+                
+                // Queued behind any pending messages so the order on screen is preserved
+                queueMessageElement(currentResponseElement);
             }
             
-            // Parse markdown and sanitize HTML
-            const rawHtml = marked.parse(fullContent);
-            const sanitizedHtml = DOMPurify.sanitize(rawHtml);
+            // Chunks are deltas; the full text is accumulated here
+            streamedContent += chunk;
+            pendingFull = streamedContent;
+            if (!renderScheduled) {
+                renderScheduled = true;
+                requestAnimationFrame(renderStream);
+            }
+        }
+        
+        function renderStream() {
+            renderScheduled = false;
+            if (pendingFull === null || !currentResponseContent) {
+                return;
+            }
             
-            currentResponseElement.innerHTML = `
-                <div>${sanitizedHtml}</div>
-                <div class="timestamp">Responding...</div>
-            `;
+            const fullContent = pendingFull;
+            pendingFull = null;
+            renderIncremental(fullContent);
             
-            const chatContainer = document.getElementById('chatContainer');
-            chatContainer.scrollTop = chatContainer.scrollHeight;
+            if (stickToBottom) {
+                chatContainer.scrollTop = chatContainer.scrollHeight;
+            }
+        }
+        
+        function renderIncremental(fullContent) {
+            // Commit everything up to the last blank line, unless that would split a code fence
+            const boundary = fullContent.lastIndexOf('\\n\\n');
+            if (boundary > renderedPrefixLen) {
+                const block = fullContent.slice(renderedPrefixLen, boundary);
+                if (!hasOpenFence(block)) {
+                    currentCommittedNode.insertAdjacentHTML('beforeend', renderMarkdown(block));
+                    renderedPrefixLen = boundary + 2;
+                }
+            }
+            currentTailNode.innerHTML = renderMarkdown(fullContent.slice(renderedPrefixLen));
+            lastRenderedFull = fullContent;
         }
         
         function finalizeResponse(content, timestamp) {
             if (currentResponseElement) {
-                const timeStr = timestamp.toLocaleTimeString();
+                // The final text supersedes any frame still waiting to render
+                pendingFull = null;
                 
-                // Parse markdown and sanitize HTML for final response
-                const rawHtml = marked.parse(content);
-                const sanitizedHtml = DOMPurify.sanitize(rawHtml);
+                // Usually the last chunk already rendered exactly this text and only the time changes
+                if (content !== lastRenderedFull) {
+                    if (!content.startsWith((lastRenderedFull || '').slice(0, renderedPrefixLen))) {
+                        // Not a continuation of what was streamed: render it from scratch
+                        currentCommittedNode.replaceChildren();
+                        renderedPrefixLen = 0;
+                    }
+                    renderIncremental(content);
+                }
+                currentResponseTime.textContent = TIME_FMT.format(timestamp);
                 
-                currentResponseElement.innerHTML = `
-                    <div>${sanitizedHtml}</div>
-                    <div class="timestamp">${timeStr}</div>
-                `;
                 currentResponseElement = null;
+                currentResponseContent = null;
+                currentResponseTime = null;
+                currentCommittedNode = null;
+                currentTailNode = null;
+                lastRenderedFull = null;
+                streamedContent = '';
             }
         }
         
         function showTypingIndicator() {
-            document.getElementById('typingIndicator').classList.add('active');
+            els.typingIndicator.classList.add('active');
         }
         
         function hideTypingIndicator() {
-            document.getElementById('typingIndicator').classList.remove('active');
+            els.typingIndicator.classList.remove('active');
         }
         
         function setLanguage() {
-            const languageSelect = document.getElementById('languageSelect');
+            const languageSelect = els.languageSelect;
             const selectedLanguage = languageSelect.value;
             
             if (socket && socket.readyState === WebSocket.OPEN) {
@@ -852,7 +1297,7 @@ def get_html_content() -> str:
         function loadLanguagePreference() {
             const savedLanguage = localStorage.getItem('userLanguage');
             if (savedLanguage) {
-                const languageSelect = document.getElementById('languageSelect');
+                const languageSelect = els.languageSelect;
                 languageSelect.value = savedLanguage;
                 // Send language preference when connection is established
                 if (socket && socket.readyState === WebSocket.OPEN) {
@@ -862,7 +1307,7 @@ def get_html_content() -> str:
         }
         
         function populateModelDropdown(models, currentModel) {
-            const modelSelect = document.getElementById('modelSelect');
+            const modelSelect = els.modelSelect;
             modelSelect.innerHTML = ''; // Clear existing options
             
             // Add options for each available model
@@ -884,7 +1329,7 @@ def get_html_content() -> str:
         }
         
         function setModel() {
-            const modelSelect = document.getElementById('modelSelect');
+            const modelSelect = els.modelSelect;
             const selectedModel = modelSelect.value;
             
             if (socket && socket.readyState === WebSocket.OPEN) {
@@ -905,19 +1350,19 @@ def get_html_content() -> str:
         }
         
         function disableModelDropdown() {
-            const modelSelect = document.getElementById('modelSelect');
+            const modelSelect = els.modelSelect;
             modelSelect.disabled = true;
         }
         
         function enableModelDropdown() {
-            const modelSelect = document.getElementById('modelSelect');
+            const modelSelect = els.modelSelect;
             modelSelect.disabled = false;
         }
         
         function loadModelPreference() {
             const savedModel = localStorage.getItem('userModel');
             if (savedModel) {
-                const modelSelect = document.getElementById('modelSelect');
+                const modelSelect = els.modelSelect;
                 // Check if the saved model is available in the current options
                 const options = Array.from(modelSelect.options);
                 const matchingOption = options.find(option => option.value === savedModel);
@@ -933,34 +1378,54 @@ def get_html_content() -> str:
         
         // Initialize the application
         document.addEventListener('DOMContentLoaded', function() {
+            // The deferred libraries have run by now
+            initMarkdown();
+            
             // Set welcome message timestamp
-            document.getElementById('welcomeTime').textContent = new Date().toLocaleTimeString();
+            els.welcomeTime.textContent = TIME_FMT.format(new Date());
             
             // Initialize WebSocket connection
             initWebSocket();
             
             // Set up language selector event listener
-            document.getElementById('languageSelect').addEventListener('change', setLanguage);
+            els.languageSelect.addEventListener('change', setLanguage);
             
             // Set up model selector event listener
-            document.getElementById('modelSelect').addEventListener('change', setModel);
+            els.modelSelect.addEventListener('change', setModel);
+            
+            // One delegated click listener per button group, dispatching on data-action
+            els.controls.addEventListener('click', handleAction);
+            els.inputArea.addEventListener('click', handleAction);
+            els.textInput.addEventListener('keydown', handleKeyPress, {passive: true});
             
             // Load saved language preference
             loadLanguagePreference();
             
             // Focus on text input
-            document.getElementById('textInput').focus();
+            els.textInput.focus();
         });
         
+        // Registered after load so it doesn't compete with the page's own requests
+        if ('serviceWorker' in navigator) {
+            window.addEventListener('load', function() {
+                navigator.serviceWorker.register('/sw.js').catch(function(error) {
+                    console.log('Service worker not registered:', error);
+                });
+            });
+        }
+        
         // Handle page visibility change to manage connections
         document.addEventListener('visibilitychange', function() {
+            // Pauses the CSS animations while the tab is in the background
+            document.body.classList.toggle('page-hidden', document.hidden);
+            
             if (document.hidden) {
                 // Page is hidden, you might want to pause some operations
                 console.log('Page hidden');
             } else {
                 // Page is visible, ensure connection is active
                 console.log('Page visible');
-                if (!socket || socket.readyState !== WebSocket.OPEN) {
+                if (!socket || socket.readyState === WebSocket.CLOSING || socket.readyState === WebSocket.CLOSED) {
                     initWebSocket();
                 }
             }
@@ -1,88 +1,285 @@
 import asyncio
-import json
-from typing import List, Dict, Any
+import functools
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Dict, Any, Optional, Union
 from fastapi import WebSocket, WebSocketDisconnect
-from llm_client import create_llm_client, create_llm_client_legacy
-from audio_handler import AudioHandler
+import fast_json
+from llm_client import ConversationWindow, create_llm_client, create_llm_client_legacy
 from config import Config
 
+log = logging.getLogger(__name__)
+
+try:
+    import msgpack
+    # Reused for every frame instead of packb building a Packer per call; frames are
+    # only encoded on the event-loop thread, so one instance is never used concurrently
+    _packer = msgpack.Packer(use_bin_type=True)
+except ImportError:
+    msgpack = None
+
+# Subprotocol a client offers to receive MessagePack binary frames instead of JSON text
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+# Connections handled per event-loop turn when broadcasting
+BROADCAST_BATCH_SIZE = 50
+
+
+def _encode_json(message: dict) -> str:
+    """Serialize a message as a JSON text frame"""
+    return fast_json.dumps(message).decode("utf-8")
+
+
+def _encode_msgpack(message: dict) -> bytes:
+    """Serialize a message as a MessagePack binary frame"""
+    return _packer.pack(message)
+
+
+def _join_json(frames: List[str]) -> str:
+    """Wrap already-encoded JSON messages in one batch message, without re-encoding them"""
+    return '{"type":"batch","items":[' + ",".join(frames) + "]}"
+
+
+def _join_msgpack(frames: List[bytes]) -> bytes:
+    """Wrap already-encoded MessagePack messages in one batch message, without re-encoding them"""
+    return _MSGPACK_BATCH_PREFIX + _packer.pack_array_header(len(frames)) + b"".join(frames)
+
+
+# A two-entry map header, the "type": "batch" pair and the "items" key
+_MSGPACK_BATCH_PREFIX = b"\x82\xa4type\xa5batch\xa5items"
+
+# Encoder -> how frames it produced are combined into one batch frame
+_BATCH_JOINERS = {_encode_json: _join_json, _encode_msgpack: _join_msgpack}
+
+try:
+    import msgspec
+
+    class ClientMessage(msgspec.Struct):
+        """Inbound WebSocket message, parsed and validated in a single pass"""
+        type: str = ""
+        content: Optional[str] = None
+        language: Optional[str] = None
+        model: Optional[str] = None
+
+        def get(self, key: str, default=None):
+            """dict-style access, so handlers work with either decoder"""
+            value = getattr(self, key, None)
+            return default if value is None else value
+
+    decode_client_message = msgspec.json.Decoder(ClientMessage).decode
+except ImportError:
+    # Without msgspec, messages are plain dicts
+    decode_client_message = fast_json.loads
+
+
+
+@functools.lru_cache(maxsize=None)
+def _available_models_frame(encode: Callable[[dict], Union[str, bytes]]) -> Union[str, bytes]:
+    """The available_models message, encoded once per wire format"""
+    return encode({
+        "type": "available_models",
+        "models": Config.AVAILABLE_MODELS,
+        "current_model": Config.DEFAULT_MODEL_ID
+    })
+
+
+class _ChunkCoalescer:
+    """Collects streamed response chunks and sends them as one frame per flush interval"""
+    
+    def __init__(self, manager: "ConnectionManager", websocket: WebSocket, interval: float):
+        self._manager = manager
+        self._websocket = websocket
+        self._interval = interval
+        self._chunks: List[str] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+    
+    def add(self, chunk: str):
+        """Buffer a chunk; the first one of a batch arms the flush timer"""
+        self._chunks.append(chunk)
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self._interval, self.flush)
+    
+    def flush(self):
+        """Send whatever is buffered as a single response_chunk delta"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._chunks:
+            content = "".join(self._chunks)
+            self._chunks.clear()
+            self._manager.send_now({"type": "response_chunk", "content": content}, self._websocket)
+
+
+@dataclass
+class ConnState:
+    """Everything the manager tracks for one WebSocket connection"""
+    # Wire format negotiated for the connection: JSON text, or MessagePack binary
+    encode: Callable[[dict], Union[str, bytes]]
+    # Serialized outbound frames, written by the connection's sender task
+    outbound: asyncio.Queue
+    sender: Optional[asyncio.Task] = None
+    # Append-only window, so each turn resends the same prefix (provider prompt caching)
+    history: ConversationWindow = field(default_factory=ConversationWindow)
+    llm: Any = None
+    model_cfg: Dict = field(default_factory=dict)
+    last_model_switch: float = 0.0
+
+
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.conversation_histories: Dict[WebSocket, List[Dict[str, str]]] = {}
-        self.connection_audio_handlers: Dict[WebSocket, AudioHandler] = {}
-        # Per-connection LLM clients and configurations
-        self.connection_llm_clients: Dict[WebSocket, Any] = {}
-        self.connection_model_configs: Dict[WebSocket, Dict] = {}
+        # One entry per open connection; dicts keep insertion (connect) order
+        self.conns: Dict[WebSocket, ConnState] = {}
+        # Inbound message type -> handler(websocket, data), resolved with one lookup per message
+        self._dispatch: Dict[str, Callable[[WebSocket, Any], Awaitable[None]]] = {
+            "start_listening": lambda websocket, data: self.start_audio_listening(websocket),
+            "stop_listening": lambda websocket, data: self.stop_audio_listening(websocket),
+            "text_input": self._on_text_input,
+            "clear_history": self._on_clear_history,
+            "set_language": self.handle_language_change,
+            "set_model": self.handle_model_change,
+        }
+    
+    @property
+    def active_connections(self):
+        """The open connections, in the order they connected"""
+        return self.conns.keys()
     
     async def connect(self, websocket: WebSocket):
         """Accept new WebSocket connection"""
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        self.conversation_histories[websocket] = []
+        if msgpack is not None and MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", ()):
+            await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL)
+            encode = _encode_msgpack
+        else:
+            await websocket.accept()
+            encode = _encode_json
+        state = ConnState(encode=encode, outbound=asyncio.Queue(maxsize=Config.WS_SEND_QUEUE_SIZE),
+                          history=self._new_history())
+        self.conns[websocket] = state
+        state.sender = asyncio.create_task(self._sender(websocket, state))
         
         # Initialize default LLM client for this connection
         try:
-            default_llm_client = create_llm_client(Config.DEFAULT_MODEL_ID)
-            self.connection_llm_clients[websocket] = default_llm_client
-            self.connection_model_configs[websocket] = Config.get_model_config(Config.DEFAULT_MODEL_ID)
-            print(f"Client connected with default model: {Config.DEFAULT_MODEL_ID}. Total connections: {len(self.active_connections)}")
+            state.llm = create_llm_client(Config.DEFAULT_MODEL_ID)
+            state.model_cfg = Config.get_model_config(Config.DEFAULT_MODEL_ID)
+            log.info(f"Client connected with default model: {Config.DEFAULT_MODEL_ID}. Total connections: {len(self.conns)}")
             
-            # Send available models to client
-            await self.send_personal_message({
-                "type": "available_models",
-                "models": Config.AVAILABLE_MODELS,
-                "current_model": Config.DEFAULT_MODEL_ID
-            }, websocket)
+            # Send available models to client; the frame is identical for every connection
+            self._enqueue(websocket, _available_models_frame(encode))
             
         except Exception as e:
-            print(f"Error initializing LLM client for connection: {e}")
+            log.error(f"Error initializing LLM client for connection: {e}")
             # Fall back to legacy client
-            self.connection_llm_clients[websocket] = create_llm_client_legacy()
-            self.connection_model_configs[websocket] = Config.get_model_config(Config.DEFAULT_MODEL_ID)
+            state.llm = create_llm_client_legacy()
+            state.model_cfg = Config.get_model_config(Config.DEFAULT_MODEL_ID)
+    
+    @staticmethod
+    def _new_history() -> ConversationWindow:
+        """Create an empty conversation history"""
+        return ConversationWindow()
     
     def disconnect(self, websocket: WebSocket):
         """Remove WebSocket connection"""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        if websocket in self.conversation_histories:
-            del self.conversation_histories[websocket]
-        if websocket in self.connection_audio_handlers:
-            del self.connection_audio_handlers[websocket]
-        # Clean up per-connection LLM client data
-        if websocket in self.connection_llm_clients:
-            del self.connection_llm_clients[websocket]
-        if websocket in self.connection_model_configs:
-            del self.connection_model_configs[websocket]
-        print(f"Client disconnected. Total connections: {len(self.active_connections)}")
+        state = self.conns.pop(websocket, None)
+        if state is None:
+            return  # Already disconnected
+        state.sender.cancel()
+        log.info(f"Client disconnected. Total connections: {len(self.conns)}")
+    
+    async def _sender(self, websocket: WebSocket, state: ConnState):
+        """Write queued frames to one connection, in order; a dead or stalled peer is dropped"""
+        outbound = state.outbound
+        join = _BATCH_JOINERS[state.encode]
+        try:
+            while True:
+                frame = await outbound.get()
+                if not outbound.empty():
+                    # The peer fell behind: send what has piled up as one batch frame
+                    frames = [frame]
+                    while len(frames) < Config.WS_SEND_BATCH_MAX and not outbound.empty():
+                        frames.append(outbound.get_nowait())
+                    frame = join(frames)
+                if isinstance(frame, bytes):
+                    send = websocket.send_bytes(frame)
+                else:
+                    send = websocket.send_text(frame)
+                await asyncio.wait_for(send, Config.WS_SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            log.warning("Client stopped reading for %.0fs, disconnecting", Config.WS_SEND_TIMEOUT)
+            self.disconnect(websocket)
+            asyncio.ensure_future(websocket.close(code=1013))  # 1013: try again later
+        except Exception as e:
+            log.error("Error sending message: %s", e)
+            self.disconnect(websocket)
+    
+    def _enqueue(self, websocket: WebSocket, frame: Union[str, bytes]):
+        """Queue a serialized frame; a client too slow to keep up is disconnected"""
+        state = self.conns.get(websocket)
+        if state is None:
+            return
+        try:
+            state.outbound.put_nowait(frame)
+        except asyncio.QueueFull:
+            log.warning("Client send queue full, disconnecting slow client")
+            self.disconnect(websocket)
+            asyncio.ensure_future(websocket.close(code=1013))  # 1013: try again later
     
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """Send message to specific connection"""
+        self.send_now(message, websocket)
+    
+    def send_now(self, message: dict, websocket: WebSocket):
+        """Queue a message for a connection without awaiting (usable from loop callbacks)"""
+        state = self.conns.get(websocket)
+        if state is None:
+            return
         try:
-            await websocket.send_text(json.dumps(message))
+            self._enqueue(websocket, state.encode(message))
         except Exception as e:
-            print(f"Error sending message: {e}")
+            log.error(f"Error sending message: {e}")
     
     async def broadcast(self, message: dict):
         """Send message to all connections"""
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except Exception as e:
-                print(f"Error broadcasting message: {e}")
+        if not self.conns:
+            return  # Nobody listening
+        # Serialize once per wire format, not once per recipient
+        frames = {}
+        connections = tuple(self.conns.items())
+        for start in range(0, len(connections), BROADCAST_BATCH_SIZE):
+            if start:
+                # Let other work run between batches of a large fan-out
+                await asyncio.sleep(0)
+            for connection, state in connections[start:start + BROADCAST_BATCH_SIZE]:
+                frame = frames.get(state.encode)
+                if frame is None:
+                    frame = frames[state.encode] = state.encode(message)
+                self._enqueue(connection, frame)
+    
+    @staticmethod
+    def transcription_message(transcribed_text: str) -> dict:
+        """The message announcing a transcription to clients"""
+        return {
+            "type": "transcription",
+            "content": transcribed_text
+        }
     
     async def handle_transcription(self, websocket: WebSocket, transcribed_text: str):
         """Handle transcribed audio and get LLM response"""
+        # Send transcription to client
+        await self.send_personal_message(self.transcription_message(transcribed_text), websocket)
+        await self.respond_to_transcription(websocket, transcribed_text)
+    
+    async def respond_to_transcription(self, websocket: WebSocket, transcribed_text: str):
+        """Get and stream the LLM response for a transcription the client has already received"""
+        state = self.conns.get(websocket)
+        if state is None:
+            return  # Disconnected before the response started
+        # Tokens go out as deltas batched over a short interval, not one frame each
+        coalescer = _ChunkCoalescer(self, websocket, Config.WS_CHUNK_FLUSH_INTERVAL)
         try:
-            # Send transcription to client
-            await self.send_personal_message({
-                "type": "transcription",
-                "content": transcribed_text,
-                "timestamp": asyncio.get_event_loop().time()
-            }, websocket)
-            
             # Add to conversation history
-            conversation_history = self.conversation_histories.get(websocket, [])
+            conversation_history = state.history
             conversation_history.append({"role": "user", "content": transcribed_text})
             
             # Send "thinking" status
@@ -94,66 +291,57 @@ class ConnectionManager:
             
             # Get LLM response (streaming) using per-connection client
             response_content = ""
-            llm_client = self.connection_llm_clients.get(websocket)
+            llm_client = state.llm
             if not llm_client:
                 # Fallback if no client is set for this connection
-                llm_client = create_llm_client_legacy()
-                self.connection_llm_clients[websocket] = llm_client
+                llm_client = state.llm = create_llm_client_legacy()
             
             async for chunk in llm_client.get_streaming_response(
                 transcribed_text, 
                 conversation_history
             ):
                 response_content += chunk
-                await self.send_personal_message({
-                    "type": "response_chunk",
-                    "content": chunk,
-                    "full_content": response_content,
-                    "timestamp": asyncio.get_event_loop().time()
-                }, websocket)
+                coalescer.add(chunk)
+            coalescer.flush()
             
             # Add assistant response to conversation history
             conversation_history.append({"role": "assistant", "content": response_content})
-            self.conversation_histories[websocket] = conversation_history
             
             # Send completion status
             await self.send_personal_message({
                 "type": "response_complete",
-                "content": response_content,
-                "timestamp": asyncio.get_event_loop().time()
+                "content": response_content
             }, websocket)
             
         except Exception as e:
-            print(f"Error handling transcription: {e}")
+            coalescer.flush()
+            log.error(f"Error handling transcription: {e}")
             await self.send_personal_message({
                 "type": "error",
-                "content": f"Error processing request: {str(e)}",
-                "timestamp": asyncio.get_event_loop().time()
+                "content": f"Error processing request: {str(e)}"
             }, websocket)
     
     async def handle_message(self, websocket: WebSocket, data: dict):
         """Handle incoming WebSocket messages"""
-        message_type = data.get("type")
-        
-        if message_type == "start_listening":
-            await self.start_audio_listening(websocket)
-        elif message_type == "stop_listening":
-            await self.stop_audio_listening(websocket)
-        elif message_type == "text_input":
-            # Handle direct text input (for testing or manual input)
-            text = data.get("content", "")
-            if text.strip():
-                await self.handle_transcription(websocket, text)
-        elif message_type == "clear_history":
-            self.conversation_histories[websocket] = []
-            await self.send_personal_message({
-                "type": "history_cleared",
-                "message": "Conversation history cleared"
-            }, websocket)
-        elif message_type == "set_language":
-            await self.handle_language_change(websocket, data)
-        elif message_type == "set_model":
-            await self.handle_model_change(websocket, data)
+        handler = self._dispatch.get(data.get("type"))
+        if handler is not None:
+            await handler(websocket, data)
+    
+    async def _on_text_input(self, websocket: WebSocket, data: dict):
+        """Handle direct text input (for testing or manual input)"""
+        text = data.get("content", "")
+        if text.strip():
+            await self.handle_transcription(websocket, text)
+    
+    async def _on_clear_history(self, websocket: WebSocket, data: dict):
+        """Start a fresh conversation for this connection"""
+        state = self.conns.get(websocket)
+        if state is not None:
+            state.history = self._new_history()
+        await self.send_personal_message({
+            "type": "history_cleared",
+            "message": "Conversation history cleared"
+        }, websocket)
     
     async def handle_language_change(self, websocket: WebSocket, data: dict):
         """Handle language change request"""
@@ -172,86 +360,93 @@ class ConnectionManager:
                 else:
                     await self.send_personal_message({
                         "type": "error",
-                        "content": f"Unsupported language: {language}",
-                        "timestamp": asyncio.get_event_loop().time()
+                        "content": f"Unsupported language: {language}"
                     }, websocket)
             else:
                 await self.send_personal_message({
                     "type": "error",
-                    "content": "Audio handler not available",
-                    "timestamp": asyncio.get_event_loop().time()
+                    "content": "Audio handler not available"
                 }, websocket)
         except Exception as e:
-            print(f"Error handling language change: {e}")
+            log.error(f"Error handling language change: {e}")
             await self.send_personal_message({
                 "type": "error",
-                "content": f"Error changing language: {str(e)}",
-                "timestamp": asyncio.get_event_loop().time()
+                "content": f"Error changing language: {str(e)}"
             }, websocket)
     
     async def start_audio_listening(self, websocket: WebSocket):
-        """Start audio listening for specific client"""
-        # This would be implemented per-client if needed
-        # For now, we'll handle audio globally in the main server
+        """Start audio capture and confirm to the client"""
+        from main import audio_handler as global_audio_handler
+        if not global_audio_handler:
+            await self._send_audio_unavailable(websocket)
+            return
+        # Opening the device and starting threads blocks; keep it off the event loop
+        await asyncio.to_thread(global_audio_handler.start_listening)
         await self.send_personal_message({
             "type": "listening_started",
             "message": "Audio listening started"
         }, websocket)
     
     async def stop_audio_listening(self, websocket: WebSocket):
-        """Stop audio listening for specific client"""
+        """Stop audio capture and confirm to the client"""
+        from main import audio_handler as global_audio_handler
+        if not global_audio_handler:
+            await self._send_audio_unavailable(websocket)
+            return
+        await asyncio.to_thread(global_audio_handler.stop_listening)
         await self.send_personal_message({
             "type": "listening_stopped",
             "message": "Audio listening stopped"
         }, websocket)
     
+    async def _send_audio_unavailable(self, websocket: WebSocket):
+        """Tell the client there is no audio capture in this process (e.g. --api-only)"""
+        await self.send_personal_message({
+            "type": "error",
+            "content": "Audio handler not available"
+        }, websocket)
+    
     async def handle_model_change(self, websocket: WebSocket, data: dict):
         """Handle model switching request with security validation"""
+        state = self.conns.get(websocket)
+        if state is None:
+            return
+        # Monotonic loop time, for the switch cooldown
+        current_time = asyncio.get_running_loop().time()
         try:
             new_model_id = data.get("model")
             
             # 1. SERVER-SIDE VALIDATION (CRITICAL FOR SECURITY)
-            if not new_model_id or new_model_id not in Config.AVAILABLE_MODELS.values():
+            if not new_model_id or new_model_id not in Config.ALLOWED_MODEL_IDS:
                 await self.send_personal_message({
                     "type": "error",
-                    "content": f"Invalid or disallowed model: {new_model_id}",
-                    "timestamp": asyncio.get_event_loop().time()
+                    "content": f"Invalid or disallowed model: {new_model_id}"
                 }, websocket)
                 return
             
             # 2. Rate limiting check (prevent rapid switching)
             # Note: This is a basic implementation. For production, consider using Redis
-            current_time = asyncio.get_event_loop().time()
-            last_switch_time = getattr(websocket, '_last_model_switch', 0)
-            if current_time - last_switch_time < 2.0:  # 2 second cooldown
+            if current_time - state.last_model_switch < 2.0:  # 2 second cooldown
                 await self.send_personal_message({
                     "type": "error", 
-                    "content": "Model switching too frequently. Please wait a moment.",
-                    "timestamp": current_time
+                    "content": "Model switching too frequently. Please wait a moment."
                 }, websocket)
                 return
             
-            websocket._last_model_switch = current_time
+            state.last_model_switch = current_time
             
             # 3. Use the factory to create the new client
             new_llm_client = create_llm_client(new_model_id)
-            old_model_id = getattr(self.connection_llm_clients.get(websocket), 'model', 'unknown')
-            
-            # 3.5. Get user-friendly display names for both old and new models
-            def get_display_name(model_id):
-                """Get user-friendly display name for a model ID"""
-                for display_name, mapped_id in Config.AVAILABLE_MODELS.items():
-                    if mapped_id == model_id:
-                        return display_name
-                return model_id  # Fallback to raw ID if not found
+            old_model_id = getattr(state.llm, 'model', 'unknown')
             
-            new_model_display_name = get_display_name(new_model_id)
-            old_model_display_name = get_display_name(old_model_id)
+            # 3.5. Get user-friendly display names for both old and new models (raw ID if unlisted)
+            new_model_display_name = Config.MODEL_DISPLAY_NAMES.get(new_model_id, new_model_id)
+            old_model_display_name = Config.MODEL_DISPLAY_NAMES.get(old_model_id, old_model_id)
             
             # 4. Update connection state
-            self.connection_llm_clients[websocket] = new_llm_client
+            state.llm = new_llm_client
             new_config = Config.get_model_config(new_model_id)
-            self.connection_model_configs[websocket] = new_config
+            state.model_cfg = new_config
             
             # 4.5. Update global audio handler with new model config for real-time processing
             try:
@@ -259,7 +454,7 @@ class ConnectionManager:
                 if global_audio_handler:
                     global_audio_handler.update_realtime_config(new_config)
             except Exception as e:
-                print(f"Warning: Could not update audio handler config: {e}")
+                log.warning(f"Warning: Could not update audio handler config: {e}")
             
             # 5. Send confirmation to the client
             await self.send_personal_message({
@@ -269,26 +464,23 @@ class ConnectionManager:
                 "new_model": new_model_id,
                 "old_model_display_name": old_model_display_name,
                 "new_model_display_name": new_model_display_name,
-                "config": Config.get_model_config(new_model_id),
-                "message": f"Model switched from {old_model_display_name} to {new_model_display_name}",
-                "timestamp": current_time
+                "config": new_config,
+                "message": f"Model switched from {old_model_display_name} to {new_model_display_name}"
             }, websocket)
             
-            print(f"Client switched model from {old_model_id} to {new_model_id}")
+            log.info(f"Client switched model from {old_model_id} to {new_model_id}")
             
         except ValueError as e:
             # This will catch missing API keys or other validation errors from the factory
             await self.send_personal_message({
                 "type": "error",
-                "content": f"Model switch failed: {str(e)}",
-                "timestamp": asyncio.get_event_loop().time()
+                "content": f"Model switch failed: {str(e)}"
             }, websocket)
         except Exception as e:
-            print(f"Error handling model change: {e}")
+            log.error(f"Error handling model change: {e}")
             await self.send_personal_message({
                 "type": "error",
-                "content": f"Error switching model: {str(e)}",
-                "timestamp": asyncio.get_event_loop().time()
+                "content": f"Error switching model: {str(e)}"
             }, websocket)
 
 # Global connection manager instance